@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Offline output for the data generator.
+
+Instead of a live database, every table is streamed to chunked, compressed
+files under one directory - Postgres COPY text or binary, or Parquet - with
+a manifest.json listing each file's row count and key range. A dataset built
+once can then be loaded anywhere with parallel COPY (--load-dir).
+"""
+
+import gzip
+import json
+import multiprocessing
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import psycopg2
+
+# Column types of every table the generator writes, as Postgres declares them
+COLUMN_TYPES = {
+    'brands': {'id': 'int4', 'name': 'text'},
+    'sub_brands': {'id': 'int4', 'brand_id': 'int4', 'name': 'text'},
+    'channels': {'id': 'int4', 'brand_id': 'int4', 'name': 'text', 'description': 'text', 'type': 'text'},
+    'payment_types': {'id': 'int4', 'brand_id': 'int4', 'description': 'text'},
+    'stores': {
+        'id': 'int4', 'brand_id': 'int4', 'sub_brand_id': 'int4', 'name': 'text',
+        'city': 'text', 'state': 'text', 'district': 'text', 'address_street': 'text',
+        'address_number': 'int4', 'latitude': 'numeric(9,6)', 'longitude': 'numeric(9,6)',
+        'is_active': 'bool', 'is_own': 'bool', 'creation_date': 'date', 'created_at': 'timestamp',
+    },
+    'categories': {'id': 'int4', 'brand_id': 'int4', 'name': 'text', 'type': 'text'},
+    'products': {
+        'id': 'int4', 'brand_id': 'int4', 'sub_brand_id': 'int4', 'category_id': 'int4',
+        'name': 'text', 'pos_uuid': 'text',
+    },
+    'items': {
+        'id': 'int4', 'brand_id': 'int4', 'sub_brand_id': 'int4', 'category_id': 'int4',
+        'name': 'text', 'pos_uuid': 'text',
+    },
+    'option_groups': {'id': 'int4', 'brand_id': 'int4', 'name': 'text'},
+    'customers': {
+        'id': 'int4', 'customer_name': 'text', 'email': 'text', 'phone_number': 'text',
+        'cpf': 'text', 'birth_date': 'date', 'gender': 'text', 'agree_terms': 'bool',
+        'receive_promotions_email': 'bool', 'registration_origin': 'text', 'created_at': 'timestamp',
+    },
+    'sales': {
+        'id': 'int4', 'store_id': 'int4', 'customer_id': 'int4', 'channel_id': 'int4',
+        'customer_name': 'text', 'created_at': 'timestamp', 'sale_status_desc': 'text',
+        'total_amount_items': 'numeric(10,2)', 'total_discount': 'numeric(10,2)',
+        'total_increase': 'numeric(10,2)', 'delivery_fee': 'numeric(10,2)',
+        'service_tax_fee': 'numeric(10,2)', 'total_amount': 'numeric(10,2)',
+        'value_paid': 'numeric(10,2)', 'production_seconds': 'int4', 'delivery_seconds': 'int4',
+        'discount_reason': 'text', 'people_quantity': 'int4', 'origin': 'text',
+    },
+    'product_sales': {
+        'id': 'int4', 'sale_id': 'int4', 'product_id': 'int4', 'quantity': 'float8',
+        'base_price': 'float8', 'total_price': 'float8',
+    },
+    'item_product_sales': {
+        'product_sale_id': 'int4', 'item_id': 'int4', 'option_group_id': 'int4',
+        'quantity': 'float8', 'additional_price': 'float8', 'price': 'float8', 'amount': 'float8',
+    },
+    'delivery_sales': {
+        'id': 'int4', 'sale_id': 'int4', 'courier_name': 'text', 'courier_phone': 'text',
+        'courier_type': 'text', 'delivery_type': 'text', 'status': 'text',
+        'delivery_fee': 'float8', 'courier_fee': 'float8',
+    },
+    'delivery_addresses': {
+        'sale_id': 'int4', 'delivery_sale_id': 'int4', 'street': 'text', 'number': 'text',
+        'complement': 'text', 'neighborhood': 'text', 'city': 'text', 'state': 'text',
+        'postal_code': 'text', 'latitude': 'float8', 'longitude': 'float8',
+    },
+    'payments': {'sale_id': 'int4', 'payment_type_id': 'int4', 'value': 'numeric(10,2)'},
+}
+
+# Foreign-key order: a table only references tables listed before it
+TABLE_ORDER = list(COLUMN_TYPES)
+
+# Tables whose primary keys are assigned by the generator
+KEYED_TABLES = [table for table, types in COLUMN_TYPES.items() if 'id' in types]
+
+# Rows per file before a part rolls over to its next chunk
+MAX_ROWS_PER_FILE = 1_000_000
+
+# Rows buffered per Parquet row group: the most a Parquet file holds in memory
+PARQUET_ROW_GROUP_SIZE = 100_000
+
+# Fast gzip level: generation, not compression, should set the pace
+GZIP_LEVEL = 1
+
+# COPY text format escapes
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def format_copy_value(value):
+    """Render a Python value as a COPY text-format field"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    return str(value)
+
+
+# COPY binary format: signature, flags and header extension length
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PG_EPOCH = datetime(2000, 1, 1)
+PG_EPOCH_DATE = PG_EPOCH.date()
+
+
+def encode_numeric(value):
+    """Postgres binary numeric: base-10000 digits with weight, sign and display scale"""
+    sign, digits, exponent = Decimal(str(value)).as_tuple()
+    digits = ''.join(map(str, digits))
+    if exponent > 0:
+        digits += '0' * exponent
+        exponent = 0
+    digits = digits.rjust(-exponent, '0')
+    integer, fraction = digits[:len(digits) + exponent], digits[len(digits) + exponent:]
+
+    integer = integer.rjust(-(-len(integer) // 4) * 4, '0')
+    fraction = fraction.ljust(-(-len(fraction) // 4) * 4, '0')
+    groups = [int(integer[i:i + 4]) for i in range(0, len(integer), 4)]
+    weight = len(groups) - 1
+    groups += [int(fraction[i:i + 4]) for i in range(0, len(fraction), 4)]
+
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    return struct.pack(f'>hhHh{len(groups)}h', len(groups), weight,
+                       0x4000 if sign else 0, -exponent, *groups)
+
+
+BINARY_ENCODERS = {
+    'int4': struct.Struct('>i').pack,
+    'float8': struct.Struct('>d').pack,
+    'bool': lambda v: b'\x01' if v else b'\x00',
+    'text': lambda v: v.encode('utf-8'),
+    'numeric': encode_numeric,
+    'timestamp': lambda v: struct.pack('>q', (v - PG_EPOCH) // timedelta(microseconds=1)),
+    'date': lambda v: struct.pack('>i', (v - PG_EPOCH_DATE).days),
+}
+
+
+def base_type(column_type):
+    """'numeric(10,2)' -> 'numeric'"""
+    return column_type.split('(')[0]
+
+
+def numeric_precision(column_type):
+    """'numeric(10,2)' -> (10, 2)"""
+    precision, scale = column_type[len('numeric('):-1].split(',')
+    return int(precision), int(scale)
+
+
+class CopyTextFile:
+    """Gzipped COPY text file (load with COPY ... FROM STDIN)"""
+    extension = 'copy.gz'
+
+    def __init__(self, path, columns, types):
+        self.file = gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=GZIP_LEVEL)
+
+    def write(self, rows):
+        self.file.writelines('\t'.join([format_copy_value(v) for v in row]) + '\n' for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class CopyBinaryFile:
+    """Gzipped COPY binary file (load with COPY ... FROM STDIN WITH (FORMAT binary))"""
+    extension = 'bin.gz'
+
+    def __init__(self, path, columns, types):
+        self.file = gzip.open(path, 'wb', compresslevel=GZIP_LEVEL)
+        self.file.write(PGCOPY_HEADER)
+        self.encoders = [BINARY_ENCODERS[base_type(t)] for t in types]
+        self.field_count = struct.pack('>h', len(columns))
+
+    def write(self, rows):
+        out = bytearray()
+        for row in rows:
+            out += self.field_count
+            for encode, value in zip(self.encoders, row):
+                if value is None:
+                    out += b'\xff\xff\xff\xff'
+                else:
+                    data = encode(value)
+                    out += struct.pack('>i', len(data))
+                    out += data
+        self.file.write(out)
+
+    def close(self):
+        self.file.write(b'\xff\xff')
+        self.file.close()
+
+
+class ParquetFile:
+    """zstd-compressed Parquet file with the Postgres column types (needs pyarrow).
+
+    Rows are written as row groups of PARQUET_ROW_GROUP_SIZE, so memory
+    stays bounded however large the file gets.
+    """
+    extension = 'parquet'
+
+    def __init__(self, path, columns, types):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.columns = columns
+        self.types = types
+        self.schema = pyarrow.schema([(column, self.arrow_type(column_type))
+                                      for column, column_type in zip(columns, types)])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        self.rows = []
+
+    def arrow_type(self, column_type):
+        pa = self.pa
+        if base_type(column_type) == 'numeric':
+            return pa.decimal128(*numeric_precision(column_type))
+        return {
+            'int4': pa.int32(), 'float8': pa.float64(), 'bool': pa.bool_(), 'text': pa.string(),
+            'timestamp': pa.timestamp('us'), 'date': pa.date32(),
+        }[column_type]
+
+    def write(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one row group"""
+        if not self.rows:
+            return
+        arrays = []
+        for values, field, column_type in zip(zip(*self.rows), self.schema, self.types):
+            if base_type(column_type) == 'numeric':
+                # Round like Postgres does when storing into numeric(p,s)
+                quantum = Decimal(1).scaleb(-numeric_precision(column_type)[1])
+                values = [None if v is None else Decimal(str(v)).quantize(quantum, ROUND_HALF_UP)
+                          for v in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+FILE_FORMATS = {
+    'copy': CopyTextFile,
+    'binary': CopyBinaryFile,
+    'parquet': ParquetFile,
+}
+
+
+class CounterIdAllocator:
+    """Assigns primary keys from counters shared by every worker process.
+
+    Stands in for the table sequences when there is no database; blocks are
+    reserved under the counter lock, so workers never hand out the same key.
+    """
+
+    def __init__(self, counters=None, block_size=20000):
+        self.counters = counters or {table: multiprocessing.Value('q', 0) for table in KEYED_TABLES}
+        self.block_size = block_size
+        self.reserved = {}
+
+    def take(self, table, count, exact=False):
+        """Return `count` unused ids for table, reserving a new block when needed"""
+        ids = self.reserved.setdefault(table, [])
+        if len(ids) < count:
+            size = count - len(ids) if exact else max(self.block_size, count - len(ids))
+            counter = self.counters[table]
+            with counter.get_lock():
+                first = counter.value + 1
+                counter.value += size
+            ids.extend(range(first, first + size))
+        taken = ids[:count]
+        del ids[:count]
+        return taken
+
+    def take_range(self, table, count):
+        """Reserve `count` consecutive ids for table, returned as a range"""
+        counter = self.counters[table]
+        with counter.get_lock():
+            first = counter.value + 1
+            counter.value += count
+        return range(first, first + count)
+
+    def last_ids(self):
+        """Highest id handed out per table (what the sequences must continue from)"""
+        return {table: counter.value for table, counter in self.counters.items() if counter.value}
+
+
+class FileOutput:
+    """Writes rows to chunked, compressed files under output_dir instead of a database.
+
+    Rows are grouped in parts (the catalog, then one part per day of sales);
+    each part gets its own files per table, so worker processes never share
+    a file. end_part() returns the manifest entries of the files it closed.
+    """
+
+    cursor = None
+    partitioned = False
+
+    def __init__(self, output_dir, file_format='copy', ids=None, max_rows_per_file=MAX_ROWS_PER_FILE):
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.file_class = FILE_FORMATS[file_format]
+        self.ids = ids or CounterIdAllocator()
+        self.max_rows_per_file = max_rows_per_file
+        self.part = None
+        self.open_files = {}
+        self.entries = []
+
+    def for_worker(self):
+        """Copy for a worker process: same directory and counters, own id blocks and files"""
+        return FileOutput(self.output_dir, self.file_format,
+                          CounterIdAllocator(self.ids.counters, self.ids.block_size),
+                          self.max_rows_per_file)
+
+    def start_part(self, name):
+        self.part = name
+        self.open_files = {}
+        self.entries = []
+
+    def write_rows(self, cursor, table, columns, rows):
+        """Append rows to the part's current file for table (cursor is unused)"""
+        if not rows:
+            return
+        current = self.open_files.get(table)
+        if current is None or current['rows'] >= self.max_rows_per_file:
+            if current:
+                self.close_file(table)
+            current = self.open_file(table, columns)
+        current['writer'].write(rows)
+        keys = [row[0] for row in rows]
+        current['rows'] += len(rows)
+        current['min_key'] = min(keys + [current['min_key']] if current['min_key'] else keys)
+        current['max_key'] = max(keys + [current['max_key']] if current['max_key'] else keys)
+
+    def open_file(self, table, columns):
+        chunk = sum(1 for e in self.entries if e['table'] == table)
+        path = os.path.join(table, f"{self.part}_{chunk:03d}.{self.file_class.extension}")
+        os.makedirs(os.path.join(self.output_dir, table), exist_ok=True)
+        types = [COLUMN_TYPES[table][c] for c in columns]
+        current = {
+            'writer': self.file_class(os.path.join(self.output_dir, path), columns, types),
+            'entry': {'table': table, 'path': path, 'columns': list(columns)},
+            'rows': 0, 'min_key': None, 'max_key': None,
+        }
+        self.open_files[table] = current
+        return current
+
+    def close_file(self, table):
+        current = self.open_files.pop(table)
+        current['writer'].close()
+        self.entries.append(dict(current['entry'], rows=current['rows'],
+                                 min_key=current['min_key'], max_key=current['max_key']))
+
+    def end_part(self):
+        for table in list(self.open_files):
+            self.close_file(table)
+        return self.entries
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def write_manifest(output_dir, file_format, files, last_ids, settings):
+    """Write manifest.json (files, row counts and key ranges per table) and return it"""
+    tables = {}
+    for table in TABLE_ORDER:
+        table_files = sorted((e for e in files if e['table'] == table), key=lambda e: e['path'])
+        if not table_files:
+            continue
+        tables[table] = {
+            'columns': table_files[0]['columns'],
+            'key': table_files[0]['columns'][0],
+            'rows': sum(e['rows'] for e in table_files),
+            'min_key': min(e['min_key'] for e in table_files),
+            'max_key': max(e['max_key'] for e in table_files),
+            'files': [{k: e[k] for k in ('path', 'rows', 'min_key', 'max_key')} for e in table_files],
+        }
+
+    manifest = {
+        'format': file_format,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': settings,
+        'tables': tables,
+        'sequences': last_ids,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+# Per-process connection of the load worker pool
+_load_worker = {}
+
+
+def init_load_worker(db_url, output_dir, file_format):
+    """Pool initializer: every worker opens its own connection"""
+    _load_worker['conn'] = psycopg2.connect(db_url)
+    _load_worker['output_dir'] = output_dir
+    _load_worker['options'] = ' WITH (FORMAT binary)' if file_format == 'binary' else ''
+
+
+def load_file(task):
+    """Worker entry point: COPY one (table, columns, path) file and commit it"""
+    table, columns, path = task
+    conn = _load_worker['conn']
+    started = time.perf_counter()
+    try:
+        with gzip.open(os.path.join(_load_worker['output_dir'], path), 'rb') as f:
+            conn.cursor().copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN{_load_worker['options']}", f
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return table, time.perf_counter() - started
+
+
+def load_output_dir(db_url, output_dir, workers=1):
+    """Load a generated directory into an empty schema with parallel COPY.
+
+    Tables load in foreign-key order; the files of one table load in
+    parallel. Sequences are then moved past the generated keys.
+    """
+    with open(os.path.join(output_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    file_format = manifest['format']
+    if file_format not in ('copy', 'binary'):
+        raise RuntimeError(f"{file_format} output cannot be loaded with COPY; "
+                           f"generate with --output-format copy or binary")
+
+    total_rows = sum(t['rows'] for t in manifest['tables'].values())
+    print(f"Loading {total_rows:,} rows from {output_dir} ({file_format}, {workers} worker(s))...")
+    pool = multiprocessing.Pool(workers, initializer=init_load_worker,
+                                initargs=(db_url, output_dir, file_format))
+    try:
+        for table, info in manifest['tables'].items():
+            started = time.perf_counter()
+            tasks = [(table, info['columns'], f['path']) for f in info['files']]
+            for _ in pool.imap_unordered(load_file, tasks):
+                pass
+            elapsed = time.perf_counter() - started
+            print(f"  → {table}: {info['rows']:,} rows from {len(tasks)} file(s) in {elapsed:.1f}s")
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.close()
+        pool.join()
+
+    conn = psycopg2.connect(db_url)
+    try:
+        cursor = conn.cursor()
+        for table, last_id in manifest['sequences'].items():
+            cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", (table, last_id))
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"✓ {total_rows:,} rows loaded")
@@ -4,16 +4,35 @@ God Level Coder Challenge - Data Generator
 Generates realistic restaurant data based on Arcca's actual models
 """
 
+import asyncio
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
 import os
+import queue
 import random
+import tempfile
+import threading
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from decimal import Decimal
+import numpy as np
 import psycopg2
 from psycopg2.extras import execute_batch
-from faker import Faker
+from faker import VERSION as FAKER_VERSION, Faker
 from dotenv import load_dotenv
 
+from file_output import (
+    FILE_FORMATS, FileOutput, format_copy_value, load_output_dir, write_manifest
+)
+from metrics import MetricsExporter, RunMetrics
+from rollups import SalesRollups, refresh_rollups, write_rollups
+from samplers import AliasSampler
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -74,12 +93,88 @@ DISCOUNT_REASONS = [
 
 DELIVERY_TYPES = ['DELIVERY', 'TAKEOUT', 'INDOOR']
 COURIER_TYPES = ['PLATFORM', 'OWN', 'THIRD_PARTY']
+DELIVERY_FEES = [500, 700, 900, 1200, 1500]  # cents
+ADDRESS_COMPLEMENTS = ['Apto 101', 'Casa', 'Bloco A', 'Fundos', None, None]
 
 
 def get_db_connection(db_url):
     return psycopg2.connect(db_url)
 
 
+def asyncpg_connect_args(db_url):
+    """A libpq connection string (URL or key=value) as asyncpg connect()/create_pool() keywords"""
+    names = {'host': 'host', 'port': 'port', 'user': 'user', 'password': 'password',
+             'dbname': 'database', 'sslmode': 'ssl'}
+    params = psycopg2.extensions.parse_dsn(db_url)
+    args = {names[key]: value for key, value in params.items() if key in names}
+    if 'port' in args:
+        args['port'] = int(args['port'])
+    return args
+
+
+# Faker providers called per sale, served from pre-generated pools
+POOLED_FAKER_FIELDS = ['name', 'phone_number', 'street_name', 'bairro', 'city', 'estado_sigla', 'postcode']
+
+# Active pools, keyed by provider name (empty = call Faker directly)
+faker_pools = {}
+
+
+def build_faker_pools(size, seed=None, cache_dir=None):
+    """Draw `size` values for every pooled Faker provider, reusing a disk cache when present.
+
+    seed is derived from the run seed (derive_seed(run_seed, 'faker_pools')), so
+    runs with different seeds get different pools; None draws a random one.
+    Cache files are keyed by Faker version, size and seed.
+    """
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"faker_pools_pt_BR_{FAKER_VERSION}_{size}_{seed}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding='utf-8') as f:
+                print(f"✓ Faker pools loaded from {cache_path}")
+                return json.load(f)
+
+    print(f"Building Faker pools ({size:,} values per field)...")
+    pool_fake = Faker('pt_BR')
+    pool_fake.seed_instance(seed)
+    pools = {
+        field: [getattr(pool_fake, field)() for _ in range(size)]
+        for field in POOLED_FAKER_FIELDS
+    }
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(pools, f, ensure_ascii=False)
+        print(f"✓ Faker pools cached to {cache_path}")
+    return pools
+
+
+def set_faker_pools(pools):
+    """Activate pools for this process (None or {} turns pooling off)"""
+    faker_pools.clear()
+    for field, values in (pools or {}).items():
+        faker_pools[field] = np.array(values, dtype=object)
+
+
+def fake_value(field):
+    """One Faker value: sampled from its pool, or generated when unpooled"""
+    pool = faker_pools.get(field)
+    if pool is not None:
+        return pool[random.randrange(len(pool))]
+    return getattr(fake, field)()
+
+
+def fake_values(rng, field, count):
+    """`count` Faker values: pool indices drawn with rng, or generated when unpooled"""
+    pool = faker_pools.get(field)
+    if pool is not None:
+        return pool[rng.integers(0, len(pool), count)].tolist()
+    return [getattr(fake, field)() for _ in range(count)]
+
+
 def get_hour_weight(hour):
     for hour_range, weight in HOURLY_WEIGHTS.items():
         if hour in hour_range:
@@ -87,54 +182,70 @@ def get_hour_weight(hour):
     return 0.01
 
 
-def setup_base_data(conn):
+# Column lists for the catalog tables (keys first)
+BRANDS_COLUMNS = ('id', 'name')
+SUB_BRANDS_COLUMNS = ('id', 'brand_id', 'name')
+CHANNELS_COLUMNS = ('id', 'brand_id', 'name', 'description', 'type')
+PAYMENT_TYPES_COLUMNS = ('id', 'brand_id', 'description')
+STORES_COLUMNS = (
+    'id', 'brand_id', 'sub_brand_id', 'name', 'city', 'state',
+    'district', 'address_street', 'address_number',
+    'latitude', 'longitude', 'is_active', 'is_own',
+    'creation_date', 'created_at'
+)
+CATEGORIES_COLUMNS = ('id', 'brand_id', 'name', 'type')
+PRODUCTS_COLUMNS = ('id', 'brand_id', 'sub_brand_id', 'category_id', 'name', 'pos_uuid')
+ITEMS_COLUMNS = PRODUCTS_COLUMNS
+OPTION_GROUPS_COLUMNS = ('id', 'brand_id', 'name')
+CUSTOMERS_COLUMNS = (
+    'id', 'customer_name', 'email', 'phone_number', 'cpf', 'birth_date', 'gender',
+    'agree_terms', 'receive_promotions_email', 'registration_origin', 'created_at'
+)
+
+
+def write_catalog_rows(output, table, columns, rows):
+    """Key catalog rows (ids reserved exactly, no gaps) and write them, returning the ids"""
+    ids = output.ids.take(table, len(rows), exact=True)
+    output.write_rows(output.cursor, table, columns, [(i,) + row for i, row in zip(ids, rows)])
+    return ids
+
+
+def setup_base_data(output):
     """Create brands, channels, payment types"""
     print("Setting up base data...")
-    cursor = conn.cursor()
-    
+
+    write_catalog_rows(output, 'brands', BRANDS_COLUMNS, [('Nola God Level Brand',)])
+
     # Sub-brands
     sub_brands = ['Challenge Burger', 'Challenge Pizza', 'Challenge Sushi']
-    sub_brand_ids = []
+    sub_brand_ids = write_catalog_rows(
+        output, 'sub_brands', SUB_BRANDS_COLUMNS, [(BRAND_ID, sb) for sb in sub_brands]
+    )
 
-    cursor.execute("INSERT INTO brands (name) VALUES ('Nola God Level Brand')");
-    for sb in sub_brands:
-        cursor.execute(
-            "INSERT INTO sub_brands (brand_id, name) VALUES (%s, %s) RETURNING id",
-            (BRAND_ID, sb)
-        )
-        sub_brand_ids.append(cursor.fetchone()[0])
-    
     # Channels
-    channel_ids = []
-    for name, ch_type, weight, commission in CHANNELS:
-        cursor.execute("""
-            INSERT INTO channels (brand_id, name, description, type)
-            VALUES (%s, %s, %s, %s) RETURNING id
-        """, (BRAND_ID, name, f'Canal {name}', ch_type))
-        channel_ids.append({
-            'id': cursor.fetchone()[0], 
-            'name': name, 
-            'type': ch_type, 
-            'weight': weight
-        })
-    
+    ids = write_catalog_rows(output, 'channels', CHANNELS_COLUMNS, [
+        (BRAND_ID, name, f'Canal {name}', ch_type) for name, ch_type, weight, commission in CHANNELS
+    ])
+    channel_ids = [
+        {'id': channel_id, 'name': name, 'type': ch_type, 'weight': weight}
+        for channel_id, (name, ch_type, weight, commission) in zip(ids, CHANNELS)
+    ]
+
     # Payment types
-    for pt in PAYMENT_TYPES_LIST:
-        cursor.execute(
-            "INSERT INTO payment_types (brand_id, description) VALUES (%s, %s)",
-            (BRAND_ID, pt)
-        )
-    
-    conn.commit()
+    ids = write_catalog_rows(output, 'payment_types', PAYMENT_TYPES_COLUMNS, [
+        (BRAND_ID, pt) for pt in PAYMENT_TYPES_LIST
+    ])
+    payment_types = dict(zip(PAYMENT_TYPES_LIST, ids))
+
     print(f"✓ Base data: {len(sub_brand_ids)} sub-brands, {len(channel_ids)} channels")
-    return sub_brand_ids, channel_ids
+    return sub_brand_ids, channel_ids, payment_types
 
 
-def generate_stores(conn, sub_brand_ids, num_stores=50):
-    """Generate realistic stores"""
+def generate_stores(output, sub_brand_ids, num_stores=50, end_date=None):
+    """Generate realistic stores, opened 6 months to 2 years before end_date (default: today)"""
     print(f"Generating {num_stores} stores...")
-    cursor = conn.cursor()
-    stores = []
+    end_date = (end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
     
     cities = [fake.city() for _ in range(20)]
     
@@ -149,15 +260,7 @@ def generate_stores(conn, sub_brand_ids, num_stores=50):
         base_lat = -23.5 + random.uniform(-2, 2)  # -25.5 to -21.5
         base_long = -46.6 + random.uniform(-3, 3)  # -49.6 to -43.6
         
-        cursor.execute("""
-            INSERT INTO stores (
-                brand_id, sub_brand_id, name, city, state, 
-                district, address_street, address_number,
-                latitude, longitude, is_active, is_own,
-                creation_date, created_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
+        rows.append((
             BRAND_ID, sub_brand_id,
             f"{fake.company()} - {city}",
             city, fake.estado_sigla(), fake.bairro(),
@@ -165,33 +268,29 @@ def generate_stores(conn, sub_brand_ids, num_stores=50):
             Decimal(str(round(base_lat, 6))),
             Decimal(str(round(base_long, 6))),
             is_active, is_own,
-            fake.date_between(start_date='-2y', end_date='-6m'),
-            datetime.now() - timedelta(days=random.randint(180, 720))
+            (end_date - timedelta(days=random.randint(180, 730))).date(),
+            end_date - timedelta(days=random.randint(180, 720), seconds=random.randint(0, 86399))
         ))
-        stores.append(cursor.fetchone()[0])
     
-    conn.commit()
+    stores = write_catalog_rows(output, 'stores', STORES_COLUMNS, rows)
     print(f"✓ {len(stores)} stores created")
     return stores
 
 
-def generate_products_and_items(conn, sub_brand_ids, num_products=500, num_items=200):
+def generate_products_and_items(output, sub_brand_ids, num_products=500, num_items=200):
     """Generate products, items, and option groups"""
     print(f"Generating {num_products} products and {num_items} items...")
-    cursor = conn.cursor()
     
     products = []
+    product_rows = []
     items = []
-    option_groups = []
+    item_rows = []
     
     # Product categories
-    for cat_name in CATEGORIES_PRODUCTS:
-        cursor.execute("""
-            INSERT INTO categories (brand_id, name, type)
-            VALUES (%s, %s, 'P') RETURNING id
-        """, (BRAND_ID, cat_name))
-        cat_id = cursor.fetchone()[0]
-        
+    category_ids = write_catalog_rows(output, 'categories', CATEGORIES_COLUMNS, [
+        (BRAND_ID, cat_name, 'P') for cat_name in CATEGORIES_PRODUCTS
+    ])
+    for cat_id, cat_name in zip(category_ids, CATEGORIES_PRODUCTS):
         # Products in category
         prefixes = PRODUCT_PREFIXES.get(cat_name, [cat_name])
         products_to_create = num_products // len(CATEGORIES_PRODUCTS)
@@ -208,28 +307,20 @@ def generate_products_and_items(conn, sub_brand_ids, num_products=500, num_items
             else:
                 name = f"{prefix} G #{i+1:03d}"
             
-            cursor.execute("""
-                INSERT INTO products (brand_id, sub_brand_id, category_id, name, pos_uuid)
-                VALUES (%s, %s, %s, %s, %s) RETURNING id
-            """, (BRAND_ID, sub_brand_id, cat_id, name, f"prod_{cat_id}_{i}"))
-            
+            product_rows.append((BRAND_ID, sub_brand_id, cat_id, name, f"prod_{cat_id}_{i}"))
             products.append({
-                'id': cursor.fetchone()[0],
                 'name': name,
                 'category': cat_name,
-                'base_price': round(random.uniform(15, 120), 2),
+                'base_price_cents': round(random.uniform(15, 120) * 100),
                 'popularity': random.betavariate(2, 5),  # More realistic distribution
                 'has_customization': random.random() > 0.4  # 60% allow customization
             })
     
     # Item categories (for complements/additions)
-    for cat_name in CATEGORIES_ITEMS:
-        cursor.execute("""
-            INSERT INTO categories (brand_id, name, type)
-            VALUES (%s, %s, 'I') RETURNING id
-        """, (BRAND_ID, cat_name))
-        cat_id = cursor.fetchone()[0]
-        
+    category_ids = write_catalog_rows(output, 'categories', CATEGORIES_COLUMNS, [
+        (BRAND_ID, cat_name, 'I') for cat_name in CATEGORIES_ITEMS
+    ])
+    for cat_id, cat_name in zip(category_ids, CATEGORIES_ITEMS):
         # Items in category - use realistic names
         item_names_list = ITEM_NAMES.get(cat_name, [])
         
@@ -237,78 +328,190 @@ def generate_products_and_items(conn, sub_brand_ids, num_products=500, num_items
             # Use realistic names from the list
             for item_name in item_names_list:
                 sub_brand_id = random.choice(sub_brand_ids)
-                
-                cursor.execute("""
-                    INSERT INTO items (brand_id, sub_brand_id, category_id, name, pos_uuid)
-                    VALUES (%s, %s, %s, %s, %s) RETURNING id
-                """, (BRAND_ID, sub_brand_id, cat_id, item_name, f"item_{cat_id}_{item_name[:10]}"))
-                
+                item_rows.append((BRAND_ID, sub_brand_id, cat_id, item_name, f"item_{cat_id}_{item_name[:10]}"))
                 items.append({
-                    'id': cursor.fetchone()[0],
                     'name': item_name,
-                    'price': round(random.uniform(2, 15), 2)
+                    'price_cents': round(random.uniform(2, 15) * 100)
                 })
         else:
             # Fallback to numbered items
             for i in range(num_items // len(CATEGORIES_ITEMS)):
                 sub_brand_id = random.choice(sub_brand_ids)
                 name = f"{cat_name[:-1]} #{i+1:02d}"
-                
-                cursor.execute("""
-                    INSERT INTO items (brand_id, sub_brand_id, category_id, name, pos_uuid)
-                    VALUES (%s, %s, %s, %s, %s) RETURNING id
-                """, (BRAND_ID, sub_brand_id, cat_id, name, f"item_{cat_id}_{i}"))
-                
+                item_rows.append((BRAND_ID, sub_brand_id, cat_id, name, f"item_{cat_id}_{i}"))
                 items.append({
-                    'id': cursor.fetchone()[0],
                     'name': name,
-                    'price': round(random.uniform(2, 15), 2)
+                    'price_cents': round(random.uniform(2, 15) * 100)
                 })
     
+    for product, product_id in zip(products, write_catalog_rows(output, 'products', PRODUCTS_COLUMNS, product_rows)):
+        product['id'] = product_id
+    for item, item_id in zip(items, write_catalog_rows(output, 'items', ITEMS_COLUMNS, item_rows)):
+        item['id'] = item_id
+    
     # Option groups
     option_group_names = ['Adicionais', 'Remover', 'Ponto da Carne', 'Tamanho']
-    for og_name in option_group_names:
-        cursor.execute("""
-            INSERT INTO option_groups (brand_id, name)
-            VALUES (%s, %s) RETURNING id
-        """, (BRAND_ID, og_name))
-        option_groups.append(cursor.fetchone()[0])
+    option_groups = write_catalog_rows(output, 'option_groups', OPTION_GROUPS_COLUMNS, [
+        (BRAND_ID, og_name) for og_name in option_group_names
+    ])
     
-    conn.commit()
     print(f"✓ {len(products)} products, {len(items)} items, {len(option_groups)} option groups")
     return products, items, option_groups
 
 
-def generate_customers(conn, num_customers=10000):
-    """Generate customers"""
-    print(f"Generating {num_customers} customers...")
-    cursor = conn.cursor()
-    
-    batch = []
-    for _ in range(num_customers):
-        batch.append((
-            fake.name(), fake.email(), fake.phone_number(), fake.cpf(),
-            fake.date_of_birth(minimum_age=18, maximum_age=75),
-            random.choice(['M', 'F', 'NB', 'O']),
-            random.choice([True, False]),
-            random.choice([True, False, False]),  # 33% accept email
-            random.choice(['qr_code', 'link', 'balcony', 'pos']),
-            datetime.now() - timedelta(days=random.randint(0, 720))
-        ))
-    
-    execute_batch(cursor, """
-        INSERT INTO customers (
-            customer_name, email, phone_number, cpf, birth_date, gender,
-            agree_terms, receive_promotions_email, registration_origin, created_at
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """, batch, page_size=1000)
-    
-    cursor.execute("SELECT id FROM customers")
-    customer_ids = [row[0] for row in cursor.fetchall()]
-    
-    conn.commit()
-    print(f"✓ {len(customer_ids)} customers created")
-    return customer_ids
+def create_catalog(output, args):
+    """Write brands, channels, payment types, stores, products and items, returning the catalog.
+
+    Nothing is committed: the caller commits the whole catalog at once
+    (with its run checkpoint), so an interrupted catalog leaves no rows.
+    """
+    sub_brand_ids, channels, payment_types = setup_base_data(output)
+    seed_entity(args.seed, 'stores')
+    stores = generate_stores(output, sub_brand_ids, args.stores, args.end_date)
+    seed_entity(args.seed, 'products')
+    products, items, option_groups = generate_products_and_items(output, sub_brand_ids, args.products, args.items)
+    return {
+        'stores': stores, 'channels': channels, 'products': products,
+        'items': items, 'option_groups': option_groups, 'payment_types': payment_types
+    }
+
+
+# Customers per chunk: one Faker loop, one COPY and one commit
+CUSTOMER_CHUNK_SIZE = 50000
+
+# Per-process output of the customer worker pool
+_customer_worker = {}
+
+
+def build_customer_rows(first_id, count, seed, end_date):
+    """`count` customers keyed from first_id, drawn from their own seed.
+
+    Birth dates (18 to 75 years old) and sign-up times (up to 720 days) are
+    relative to end_date, never to the clock.
+    """
+    rng = random.Random(seed)
+    fake.seed_instance(seed)
+    today = end_date.date()
+    return [
+        (customer_id, fake.name(), fake.email(), fake.phone_number(), fake.cpf(),
+         today - timedelta(days=rng.randint(18 * 365, 75 * 365)),
+         rng.choice(['M', 'F', 'NB', 'O']),
+         rng.choice([True, False]),
+         rng.choice([True, False, False]),  # 33% accept email
+         rng.choice(['qr_code', 'link', 'balcony', 'pos']),
+         end_date - timedelta(days=rng.randint(0, 720), seconds=rng.randint(0, 86399)))
+        for customer_id in range(first_id, first_id + count)
+    ]
+
+
+def write_customer_chunk(output, task):
+    """Generate one chunk of customers and write it, returning its row count and files"""
+    index, first_id, count, seed, end_date = task
+    output.start_part(f"customers_{index:04d}")
+    output.write_rows(output.cursor, 'customers', CUSTOMERS_COLUMNS,
+                      build_customer_rows(first_id, count, seed, end_date))
+    output.commit()
+    return count, output.end_part()
+
+
+def init_customer_worker(db_url, file_output=None):
+    """Pool initializer: every worker COPYs its chunks through its own connection (or files)"""
+    _customer_worker['output'] = file_output.for_worker() if file_output else DatabaseOutput(
+        get_db_connection(db_url), 'copy'
+    )
+
+
+def run_customer_chunk(task):
+    return write_customer_chunk(_customer_worker['output'], task)
+
+
+def committed_customer_chunks(cursor, tasks):
+    """Indexes of the chunk tasks already in the database (a chunk is committed whole)"""
+    cursor.execute("SELECT id FROM customers WHERE id = ANY(%s)", ([task[1] for task in tasks],))
+    first_ids = {row[0] for row in cursor.fetchall()}
+    return {task[0] for task in tasks if task[1] in first_ids}
+
+
+def generate_customers(output, num_customers=10000, seed=None, workers=1, db_url=None, end_date=None,
+                       run_id=None, customer_ids=None):
+    """Generate customers in chunks, on `workers` processes, with COPY.
+
+    The ids are one contiguous block reserved up front and every chunk has
+    its own seed and the run's end_date (default: today), so the rows do not
+    depend on the number of workers or on when the run happens.
+    With run_id the reserved block is recorded in the run's catalog; given
+    back as customer_ids (--resume), only the chunks not committed yet are
+    generated.
+    Returns the ids as a range (what the sales generator samples from) and
+    the files written (file output only).
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    end_date = (end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    done = set()
+    if customer_ids is None:
+        customer_ids = output.ids.take_range('customers', num_customers)
+        if run_id:
+            record_run_catalog(output.cursor, run_id, {'customers': customer_ids})
+        output.commit()
+    num_customers = len(customer_ids)
+    tasks = [
+        (index, customer_ids.start + offset, min(CUSTOMER_CHUNK_SIZE, num_customers - offset),
+         derive_seed(seed, index), end_date)
+        for index, offset in enumerate(range(0, num_customers, CUSTOMER_CHUNK_SIZE))
+    ]
+    if run_id and tasks:
+        done = committed_customer_chunks(output.cursor, tasks)
+        output.commit()
+        tasks = [task for task in tasks if task[0] not in done]
+        if not tasks:
+            print(f"✓ {num_customers:,} customers already loaded")
+            return customer_ids, []
+    print(f"Generating {sum(task[2] for task in tasks):,} customers ({workers} worker(s))"
+          + (f", {len(done)} chunk(s) already loaded" if done else "") + "...")
+
+    file_output = output if isinstance(output, FileOutput) else None
+    started = time.perf_counter()
+    written = 0
+    files = []
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(workers, len(tasks)), initializer=init_customer_worker,
+                                  initargs=(db_url, file_output)) as pool:
+            results = pool.imap_unordered(run_customer_chunk, tasks)
+            for count, chunk_files in results:
+                written += count
+                files.extend(chunk_files)
+    else:
+        chunk_output = file_output.for_worker() if file_output else DatabaseOutput(output.conn, 'copy')
+        for task in tasks:
+            count, chunk_files = write_customer_chunk(chunk_output, task)
+            written += count
+            files.extend(chunk_files)
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ {written:,} customers created in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f}/s)")
+    return customer_ids, files
+
+
+def sample_ids(rng, ids, n):
+    """`n` ids drawn uniformly from a range (a contiguous block) or an array of ids"""
+    if isinstance(ids, range):
+        # Same draws as rng.choice over the materialized range
+        return ids.start + rng.integers(0, len(ids), n)
+    return rng.choice(ids, n)
+
+
+def customer_ids_json(customers):
+    """catalog['customers'] as stored in generator_runs: a range as its bounds"""
+    if isinstance(customers, range):
+        return {'first': customers.start, 'count': len(customers)}
+    return [int(c) for c in customers]
+
+
+def customer_ids_from_json(customers):
+    if isinstance(customers, dict):
+        return range(customers['first'], customers['first'] + customers['count'])
+    return np.array(customers, dtype=np.int64)
 
 
 def get_payment_types_cache(cursor):
@@ -317,169 +520,890 @@ def get_payment_types_cache(cursor):
     return {row[1]: row[0] for row in cursor.fetchall()}
 
 
-def generate_sales(conn, stores, channels, products, items, option_groups, customers, months=6):
-    """Generate sales with realistic patterns"""
-    print(f"Generating sales for {months} months...")
+def derive_seed(*parts):
+    """Derive a stable 64-bit seed from a parent seed and shard labels.
 
-    cursor = conn.cursor()
+    Seeds form a hierarchy: run seed -> entity type -> day -> shard, so any
+    piece can be regenerated from the run seed alone.
+    """
+    digest = hashlib.blake2b(':'.join(str(p) for p in parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
 
-    # Cache payment types
-    payment_types_cache = get_payment_types_cache(cursor)
 
-    start_date = datetime.now() - timedelta(days=30 * months)
-    end_date = datetime.now()
+def seed_entity(run_seed, entity):
+    """Seed the global random and Faker generators for one entity type"""
+    seed = derive_seed(run_seed, entity)
+    random.seed(seed)
+    fake.seed_instance(seed)
+    return seed
+
+
+def plan_sales_days(months, calendar_seed, end_date=None, start_date=None):
+    """Lay out the sales calendar as (date, day multiplier) pairs.
+
+    Days start at midnight and anomalies come from calendar_seed, so the
+    same seed and end date always give the same calendar, and every worker
+    sees the same bad week and promo day. start_date (--append) replaces
+    the `months` before end_date.
+    """
+    rng = random.Random(calendar_seed)
+    end_date = (end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = start_date or end_date - timedelta(days=30 * months)
 
     # Anomalies
-    anomaly_week = start_date + timedelta(days=random.randint(30, 60))
-    promo_day = start_date + timedelta(days=random.randint(90, 120))
+    anomaly_week = start_date + timedelta(days=rng.randint(30, 60))
+    promo_day = start_date + timedelta(days=rng.randint(90, 120))
 
+    days = []
     current_date = start_date
-    total_sales = 0
-    batch_size = 500
-    start_time = datetime.now()
-    total_days = (end_date - start_date).days
-    
     while current_date <= end_date:
         weekday = current_date.weekday()
         day_mult = WEEKDAY_MULT[weekday]
-        
+
         # Anomaly: bad week
         if anomaly_week <= current_date < anomaly_week + timedelta(days=7):
             day_mult *= 0.7
-        
+
         # Anomaly: promo day
         if current_date.date() == promo_day.date():
             day_mult *= 3.0
-        
-        daily_sales = int(random.gauss(2700, 400) * day_mult)
-        
-        sales_batch = []
-        
-        for _ in range(daily_sales):
-            # Hour distribution
-            hour_weights = [get_hour_weight(h) * 100 for h in range(24)]
-            hour = random.choices(range(24), weights=hour_weights)[0]
-            
-            sale_time = current_date.replace(
-                hour=hour,
-                minute=random.randint(0, 59),
-                second=random.randint(0, 59)
-            )
-            
-            # Select entities
-            store_id = random.choice(stores)
-            channel = random.choices(channels, weights=[c['weight'] for c in channels])[0]
-            customer_id = random.choice(customers) if random.random() > 0.3 else None
-            
-            # Generate sale
-            sale_data = generate_single_sale(
-                sale_time, store_id, channel, customer_id, 
-                products, items, option_groups
-            )
-            
-            sales_batch.append(sale_data)
 
-            if len(sales_batch) >= batch_size:
-                insert_sales_batch(cursor, sales_batch, payment_types_cache)
-                total_sales += len(sales_batch)
-                sales_batch = []
-                conn.commit()
+        days.append((current_date, day_mult))
+        current_date += timedelta(days=1)
 
-        # Insert remaining
-        if sales_batch:
-            insert_sales_batch(cursor, sales_batch, payment_types_cache)
-            total_sales += len(sales_batch)
-            conn.commit()
+    return days
 
-        current_date += timedelta(days=1)
 
-        # Progress reporting
-        days_processed = (current_date - start_date).days
-        if current_date.day == 1 or days_processed % 7 == 0:
-            elapsed_time = (datetime.now() - start_time).total_seconds()
-            if elapsed_time > 0:
-                sales_per_sec = total_sales / elapsed_time
-                days_remaining = total_days - days_processed
-                estimated_remaining_sec = (days_remaining / days_processed) * elapsed_time if days_processed > 0 else 0
-                estimated_remaining_min = estimated_remaining_sec / 60
-
-                print(f"  → {current_date.strftime('%Y-%m-%d')}: {total_sales:,} sales | "
-                      f"{sales_per_sec:.0f} sales/s | "
-                      f"ETA: {estimated_remaining_min:.1f} min")
-    
+# Sales per shard: the unit of seeding, insertion and commit
+SALES_SHARD_SIZE = 500
+# Mean sales on a day with multiplier 1.0
+DAILY_SALES = 2700
+
+
+def plan_day_shards(day_seed, day_mult):
+    """Split one day's sales into fixed-size shards as (shard, count, seed)"""
+    daily_sales = int(random.Random(day_seed).gauss(DAILY_SALES, 400) * day_mult)
+    return [
+        (shard, min(SALES_SHARD_SIZE, daily_sales - offset), derive_seed(day_seed, shard))
+        for shard, offset in enumerate(range(0, daily_sales, SALES_SHARD_SIZE))
+    ]
+
+
+# Run state: one row per run plus one row per committed shard. Shard rows
+# are written in the same transaction as the shard's sales, so they are
+# exactly the sales that made it into the database.
+RUN_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS generator_runs (
+        id SERIAL PRIMARY KEY,
+        settings JSONB NOT NULL,
+        catalog JSONB NOT NULL,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS generator_run_shards (
+        run_id INTEGER NOT NULL REFERENCES generator_runs(id) ON DELETE CASCADE,
+        day DATE NOT NULL,
+        shard INTEGER NOT NULL,
+        sales INTEGER NOT NULL,
+        committed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (run_id, day, shard)
+    );
+"""
+
+# Settings that change the generated data and must be reused on --resume
+RUN_SETTINGS = [
+    'seed', 'months', 'start_date', 'end_date', 'engine', 'pool_size', 'rollups',
+    'stores', 'products', 'items', 'customers'
+]
+
+
+def catalog_json(catalog):
+    if 'customers' in catalog:
+        catalog = dict(catalog, customers=customer_ids_json(catalog['customers']))
+    return json.dumps(catalog)
+
+
+def start_run(conn, settings, catalog=None):
+    """Record a new run with its settings and catalog IDs, returning the run id.
+
+    A run starts before its catalog is written: the catalog and the
+    customers block are added with record_run_catalog as they commit.
+    """
+    cursor = conn.cursor()
+    cursor.execute(RUN_STATE_DDL)
+    cursor.execute(
+        "INSERT INTO generator_runs (settings, catalog) VALUES (%s, %s) RETURNING id",
+        (json.dumps(settings), catalog_json(catalog or {}))
+    )
+    run_id = cursor.fetchone()[0]
+    conn.commit()
+    print(f"✓ Run {run_id} started (resume with --resume {run_id})")
+    return run_id
+
+
+def record_run_catalog(cursor, run_id, entries):
+    """Add catalog entries to a run, in the caller's transaction (committed with the rows they describe)"""
+    cursor.execute("UPDATE generator_runs SET catalog = catalog || %s::jsonb WHERE id = %s",
+                   (catalog_json(entries), run_id))
+
+
+# Tables written by create_catalog, in one transaction
+CATALOG_TABLES = [
+    'brands', 'sub_brands', 'channels', 'payment_types', 'stores',
+    'categories', 'products', 'items', 'option_groups'
+]
+
+
+def reset_catalog_sequences(conn):
+    """Restart the id sequences of the empty catalog tables.
+
+    A catalog transaction that was rolled back still used up its sequence
+    values; the catalog written again gets the ids of a clean run (BRAND_ID
+    first of all).
+    """
+    cursor = conn.cursor()
+    for table in CATALOG_TABLES:
+        cursor.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {table})")
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), 1, false)", (table,))
+    conn.commit()
+
+
+def new_run_conflict(conn):
+    """Why a new run must not start on this database (None when it can)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass('generator_runs') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT id FROM generator_runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1")
+            row = cursor.fetchone()
+            if row:
+                return f"run {row[0]} is unfinished: continue it with --resume {row[0]}"
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM sales), EXISTS (SELECT 1 FROM brands)")
+        has_sales, has_brands = cursor.fetchone()
+    finally:
+        conn.rollback()
+    if has_sales:
+        return "the database already has sales: extend them with --append (or reset the schema)"
+    if has_brands:
+        return "the database already has a catalog: extend it with --append (or reset the schema)"
+    return None
+
+
+def load_run(conn, run_id=None):
+    """Fetch (run id, settings, catalog) of a run, by default the latest unfinished one"""
+    cursor = conn.cursor()
+    cursor.execute(RUN_STATE_DDL)
+    if run_id:
+        cursor.execute(
+            "SELECT id, settings, catalog, finished_at FROM generator_runs WHERE id = %s", (run_id,)
+        )
+    else:
+        cursor.execute("""
+            SELECT id, settings, catalog, finished_at FROM generator_runs
+            WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1
+        """)
+    row = cursor.fetchone()
+    conn.commit()
+    if row is None:
+        raise RuntimeError(f"No run {run_id} to resume" if run_id else "No unfinished run to resume")
+    run_id, settings, catalog, finished_at = row
+    if finished_at:
+        raise RuntimeError(f"Run {run_id} already finished at {finished_at}")
+    if 'customers' in catalog:
+        catalog['customers'] = customer_ids_from_json(catalog['customers'])
+    return run_id, settings, catalog
+
+
+def completed_shards(conn, run_id):
+    """Shards already committed by a run, as {date: set of shard numbers}"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT day, shard FROM generator_run_shards WHERE run_id = %s", (run_id,))
+    done = {}
+    for day, shard in cursor.fetchall():
+        done.setdefault(day, set()).add(shard)
+    conn.commit()
+    return done
+
+
+def finish_run(conn, run_id):
+    """Mark a run as complete"""
+    cursor = conn.cursor()
+    cursor.execute("UPDATE generator_runs SET finished_at = CURRENT_TIMESTAMP WHERE id = %s", (run_id,))
+    conn.commit()
+
+
+def latest_run_catalog(cursor):
+    """Catalog recorded by the most recent run, or None when no run was recorded"""
+    cursor.execute("SELECT to_regclass('generator_runs') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute("SELECT catalog FROM generator_runs ORDER BY id DESC LIMIT 1")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def estimate_products_and_items(cursor):
+    """Rebuild product and item attributes from the sales already loaded.
+
+    Prices are the recorded base/additional prices, popularity is the share
+    of product sales relative to the best seller and a product is
+    customizable when it was ever sold with items. Products and items that
+    never sold get attributes drawn as generate_products_and_items does.
+    """
+    cursor.execute("SELECT product_id, avg(base_price), count(*) FROM product_sales GROUP BY product_id")
+    sold = {product_id: (price, count) for product_id, price, count in cursor.fetchall()}
+    cursor.execute("""
+        SELECT DISTINCT ps.product_id FROM item_product_sales ips
+        JOIN product_sales ps ON ps.id = ips.product_sale_id
+    """)
+    customized = {row[0] for row in cursor.fetchall()}
+    cursor.execute("SELECT item_id, avg(additional_price) FROM item_product_sales GROUP BY item_id")
+    item_prices = dict(cursor.fetchall())
+    best_seller = max((count for _, count in sold.values()), default=0)
+
+    cursor.execute("""
+        SELECT p.id, p.name, c.name FROM products p JOIN categories c ON c.id = p.category_id ORDER BY p.id
+    """)
+    products = []
+    for product_id, name, category in cursor.fetchall():
+        if product_id in sold:
+            price, count = sold[product_id]
+            attributes = (round(price * 100), count / best_seller, product_id in customized)
+        else:
+            attributes = (round(random.uniform(15, 120) * 100), random.betavariate(2, 5), random.random() > 0.4)
+        products.append(dict(zip(
+            ('id', 'name', 'category', 'base_price_cents', 'popularity', 'has_customization'),
+            (product_id, name, category) + attributes
+        )))
+
+    cursor.execute("SELECT id, name FROM items ORDER BY id")
+    items = [
+        {'id': item_id, 'name': name,
+         'price_cents': round(item_prices[item_id] * 100) if item_id in item_prices
+         else round(random.uniform(2, 15) * 100)}
+        for item_id, name in cursor.fetchall()
+    ]
+    return products, items
+
+
+def existing_customer_ids(cursor):
+    """Customer ids in the database: a range when they are contiguous, else an int64 array"""
+    cursor.execute("SELECT min(id), max(id), count(*) FROM customers")
+    first, last, count = cursor.fetchone()
+    if not count:
+        return range(0)
+    if last - first + 1 == count:
+        return range(first, last + 1)
+    cursor.execute("SELECT array_agg(id ORDER BY id) FROM customers")
+    return np.array(cursor.fetchone()[0], dtype=np.int64)
+
+
+def discover_catalog(conn):
+    """Read the catalog of an existing database, for --append.
+
+    Stores, channels, customers, option groups and payment types come from
+    their tables. Product and item attributes come from the latest run's
+    catalog when its products and items are still the ones in the
+    database, and are otherwise estimated from the loaded sales.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM stores ORDER BY id")
+    stores = [row[0] for row in cursor.fetchall()]
+    customers = existing_customer_ids(cursor)
+    cursor.execute("SELECT id FROM option_groups ORDER BY id")
+    option_groups = [row[0] for row in cursor.fetchall()]
+    weights = {name: weight for name, ch_type, weight, commission in CHANNELS}
+    cursor.execute("SELECT id, name, type FROM channels ORDER BY id")
+    channels = [
+        {'id': channel_id, 'name': name, 'type': ch_type, 'weight': weights.get(name, min(weights.values()))}
+        for channel_id, name, ch_type in cursor.fetchall()
+    ]
+    if not (stores and len(customers) and channels):
+        raise RuntimeError("--append needs existing stores, channels and customers; run without --append first")
+
+    run_catalog = latest_run_catalog(cursor)
+    cursor.execute("SELECT array_agg(id ORDER BY id) FROM products")
+    product_ids = cursor.fetchone()[0] or []
+    cursor.execute("SELECT array_agg(id ORDER BY id) FROM items")
+    item_ids = cursor.fetchone()[0] or []
+    if (run_catalog and sorted(p['id'] for p in run_catalog['products']) == product_ids
+            and sorted(i['id'] for i in run_catalog['items']) == item_ids
+            and all('base_price_cents' in p for p in run_catalog['products'])):
+        products, items = run_catalog['products'], run_catalog['items']
+        source = "latest run"
+    else:
+        products, items = estimate_products_and_items(cursor)
+        source = "loaded sales"
+    if not products:
+        raise RuntimeError("--append needs existing products; run without --append first")
+    catalog = {
+        'stores': stores, 'channels': channels, 'products': products,
+        'items': items, 'option_groups': option_groups, 'customers': customers,
+        'payment_types': get_payment_types_cache(cursor)
+    }
+    conn.commit()
+    print(f"✓ Found {len(stores)} stores, {len(products)} products, {len(items)} items, "
+          f"{len(customers):,} customers (product attributes from the {source})")
+    return catalog
+
+
+def next_sales_day(conn):
+    """Midnight after the latest sale, where --append starts"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT max(created_at) FROM sales")
+    latest = cursor.fetchone()[0]
+    conn.commit()
+    if latest is None:
+        raise RuntimeError("--append needs existing sales; run without --append first")
+    return latest.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def build_samplers(catalog):
+    """Alias samplers for the per-sale weighted choices, built once per run"""
+    channels = catalog['channels']
+    products = catalog['products']
+    return {
+        'hour': AliasSampler(range(24), [get_hour_weight(h) for h in range(24)]),
+        'channel': AliasSampler(channels, [c['weight'] for c in channels]),
+        'product': AliasSampler(products, [p['popularity'] for p in products]),
+        'payment_type': AliasSampler(PAYMENT_TYPES_LIST),
+        'split_payment_type': AliasSampler(PAYMENT_TYPES_LIST[:3]),
+    }
+
+
+# Columns of the batch a shard builder returns, per table (see synthesize_sales_columns)
+SALES_BATCH_FIELDS = {
+    'sales': (
+        'store_id', 'customer_id', 'channel_id', 'customer_name', 'created_at', 'status',
+        'total_items_value', 'discount', 'discount_reason', 'increase', 'delivery_fee',
+        'service_tax', 'total_amount', 'value_paid', 'production_sec', 'delivery_sec', 'people_qty'
+    ),
+    'product_sales': ('sale', 'product_id', 'quantity', 'base_price', 'total_price'),
+    'item_product_sales': ('product_sale', 'item_id', 'option_group_id', 'quantity',
+                           'additional_price', 'price'),
+    'delivery_sales': ('sale', 'courier_name', 'courier_phone', 'courier_type',
+                       'delivery_type', 'status', 'delivery_fee', 'courier_fee'),
+    'delivery_addresses': ('street', 'number', 'complement', 'neighborhood', 'city',
+                           'state', 'postal_code', 'latitude', 'longitude'),
+    'payments': ('sale', 'payment_type', 'value'),
+}
+
+
+def new_sales_batch():
+    """Empty columnar batch (one list per column) that generate_single_sale appends to"""
+    batch = {table: {field: [] for field in fields} for table, fields in SALES_BATCH_FIELDS.items()}
+    batch['count'] = 0
+    return batch
+
+
+def draw_sale(batch, current_date, catalog, samplers):
+    """Pick time, store, channel and customer for one sale of the day, then generate it into batch"""
+    sale_time = current_date.replace(
+        hour=samplers['hour'].draw(),
+        minute=random.randint(0, 59),
+        second=random.randint(0, 59)
+    )
+    draw_sale_at(batch, sale_time, catalog, samplers)
+
+
+def draw_sale_at(batch, sale_time, catalog, samplers):
+    """Pick store, channel and customer for one sale at sale_time, then generate it into batch"""
+    # Select entities
+    customers = catalog['customers']
+    store_id = random.choice(catalog['stores'])
+    channel = samplers['channel'].draw()
+    customer_id = int(random.choice(customers)) if random.random() > 0.3 else None
+
+    generate_single_sale(
+        batch, sale_time, store_id, channel, customer_id,
+        samplers, catalog['items'], catalog['option_groups']
+    )
+
+
+def build_sales_shard(state, current_date, count, seed):
+    """Python engine: one sale at a time, appended to a columnar batch"""
+    random.seed(seed)
+    fake.seed_instance(seed)
+    batch = new_sales_batch()
+    for _ in range(count):
+        draw_sale(batch, current_date, state['catalog'], state['samplers'])
+    return batch
+
+
+def build_sales_shard_columns(state, current_date, count, seed):
+    """NumPy engine: one array per column"""
+    fake.seed_instance(seed)
+    rng = np.random.default_rng(seed)
+    return synthesize_sales_columns(rng, count, current_date, state['arrays'], state['samplers'])
+
+
+def write_shard(output, batch, payment_types_cache, run_id, current_date, shard, count, metrics):
+    """Insert one shard and commit it together with its run checkpoint"""
+    started = time.perf_counter()
+    insert_sales_batch(output.cursor, batch, payment_types_cache,
+                       metrics.timed_ids(output.ids), metrics.timed_writes(output.write_rows),
+                       month_partition(current_date) if output.partitioned else None)
+    if run_id:
+        with metrics.timed('checkpoint'):
+            output.cursor.execute("""
+                INSERT INTO generator_run_shards (run_id, day, shard, sales)
+                VALUES (%s, %s, %s, %s)
+            """, (run_id, current_date.date(), shard, count))
+    with metrics.timed('commit'):
+        output.commit()
+    metrics.observe('write', time.perf_counter() - started)
+
+
+class ShardPipeline:
+    """Writes shards on background threads while the caller builds the next ones.
+
+    Every writer thread has its own output (connection). The queue is bounded,
+    so a producer that outruns the writers blocks instead of piling shards up
+    in memory. After the first writer error the remaining shards are dropped
+    and the error is raised in the producer on its next put, flush or close.
+    """
+
+    def __init__(self, outputs, payment_types_cache, run_id=None, metrics=None, depth=None):
+        self.queue = queue.Queue(depth or 2 * len(outputs))
+        self.payment_types_cache = payment_types_cache
+        self.run_id = run_id
+        self.metrics = metrics or RunMetrics()
+        self.error = None
+        self.threads = [
+            threading.Thread(target=self.write_loop, args=(output,), daemon=True)
+            for output in outputs
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def write_loop(self, output):
+        """Writer thread: write queued (date, shard, count, batch) items until the None sentinel"""
+        try:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is None:
+                        return
+                    if self.error is None:
+                        current_date, shard, count, batch = item
+                        write_shard(output, batch, self.payment_types_cache,
+                                    self.run_id, current_date, shard, count, self.metrics)
+                except BaseException as e:
+                    output.rollback()
+                    self.error = self.error or e
+                finally:
+                    self.queue.task_done()
+        finally:
+            output.close()
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def put(self, current_date, shard, count, batch):
+        """Queue a shard, blocking while the queue is full"""
+        self.check()
+        self.queue.put((current_date, shard, count, batch))
+
+    def flush(self):
+        """Wait until every queued shard is committed"""
+        self.queue.join()
+        self.check()
+
+    def close(self):
+        """Write what is queued, stop the writers and re-raise their first error"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.check()
+
+
+class AsyncShardWriter:
+    """ShardPipeline on asyncpg: shards are written concurrently over a connection pool.
+
+    An event loop on a background thread runs up to `connections` shard
+    transactions at once; each loads its tables with binary COPY
+    (copy_records_to_table) and commits them with the run checkpoint, like
+    write_shard. put blocks while `depth` shards are pending. After the
+    first error the remaining shards are dropped and the error is raised in
+    the producer on its next put, flush or close.
+    """
+
+    def __init__(self, db_url, connections, payment_types_cache, run_id=None, metrics=None,
+                 partitioned=False, depth=None):
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("--async-writers needs asyncpg (pip install asyncpg)")
+        self.payment_types_cache = payment_types_cache
+        self.run_id = run_id
+        self.metrics = metrics or RunMetrics()
+        self.partitioned = partitioned
+        self.error = None
+        self.slots = threading.BoundedSemaphore(depth or 2 * connections)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.pool = self.run(lambda: asyncpg.create_pool(
+            min_size=connections, max_size=connections, **asyncpg_connect_args(db_url)
+        ))
+        self.ids = AsyncIdAllocator(self.pool)
+
+    def run(self, make_awaitable):
+        """Await make_awaitable() on the writer loop and return the result"""
+        async def result():
+            return await make_awaitable()
+        return asyncio.run_coroutine_threadsafe(result(), self.loop).result()
+
+    async def write(self, current_date, shard, count, batch):
+        """Insert one shard and commit it together with its run checkpoint"""
+        if self.error is not None:
+            return
+        metrics = self.metrics
+        started = time.perf_counter()
+        with metrics.timed('ids'):
+            await self.ids.reserve(batch_id_counts(batch))
+        writes = []
+        insert_sales_batch(None, batch, self.payment_types_cache, self.ids,
+                           lambda cursor, table, columns, rows: writes.append((table, columns, rows)),
+                           month_partition(current_date) if self.partitioned else None)
+        async with self.pool.acquire() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                for table, columns, rows in writes:
+                    with metrics.timed('write', table):
+                        await conn.copy_records_to_table(table, columns=list(columns), records=rows)
+                    metrics.add_rows(table, len(rows))
+                if self.run_id:
+                    with metrics.timed('checkpoint'):
+                        await conn.execute("""
+                            INSERT INTO generator_run_shards (run_id, day, shard, sales)
+                            VALUES ($1, $2, $3, $4)
+                        """, self.run_id, current_date.date(), shard, count)
+            except BaseException:
+                await transaction.rollback()
+                raise
+            with metrics.timed('commit'):
+                await transaction.commit()
+        metrics.observe('write', time.perf_counter() - started)
+
+    def done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+        self.slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            self.error = self.error or future.exception()
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def put(self, current_date, shard, count, batch):
+        """Start writing a shard, blocking while `depth` shards are pending"""
+        self.check()
+        self.slots.acquire()
+        future = asyncio.run_coroutine_threadsafe(self.write(current_date, shard, count, batch), self.loop)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self.done)
+
+    def flush(self):
+        """Wait until every pending shard is committed"""
+        with self.lock:
+            pending = list(self.pending)
+        wait(pending)
+        self.check()
+
+    def close(self):
+        """Write what is pending, close the pool and stop the loop, re-raising the first error"""
+        try:
+            self.flush()
+        finally:
+            self.run(self.pool.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+
+def generate_day_sales(state, current_date, day_mult, day_seed, done_shards=()):
+    """Generate and insert one day of sales, committing every shard.
+
+    Shards in done_shards were committed by an earlier attempt and are skipped.
+    With a pipeline the shards are only queued here and committed by its
+    writers. Returns the sales count and the files written (file output only).
+    """
+    output = state['output']
+    pipeline = state['pipeline']
+    metrics = state['metrics']
+    build_shard = SALES_ENGINES[state['engine']]
+
+    output.start_part(current_date.strftime('%Y-%m-%d'))
+    total_sales = 0
+    for shard, count, shard_seed in plan_day_shards(day_seed, day_mult):
+        if shard in done_shards:
+            continue
+        with metrics.timed('synthesis', stage='synthesis'):
+            batch = build_shard(state, current_date, count, shard_seed)
+        if state['rollups'] is not None:
+            with metrics.timed('rollups'):
+                state['rollups'].add_batch(current_date, batch)
+        if pipeline:
+            with metrics.timed('queue_wait'):
+                pipeline.put(current_date, shard, count, batch)
+        else:
+            write_shard(output, batch, state['payment_types_cache'],
+                        state['run_id'], current_date, shard, count, metrics)
+        total_sales += count
+
+    return total_sales, output.end_part()
+
+
+# Per-process state of the sales worker pool
+_worker = {}
+
+
+def set_worker_state(output, catalog, engine, run_id=None, writers=0, db_url=None, loader='copy',
+                     async_writers=0, rollups=False):
+    """Bind the output, catalog, caches and writer pipeline used by run_sales_day"""
+    _worker['output'] = output
+    _worker['run_id'] = run_id
+    _worker['catalog'] = catalog
+    _worker['engine'] = engine
+    _worker['samplers'] = build_samplers(catalog)
+    _worker['arrays'] = build_catalog_arrays(catalog) if engine == 'numpy' else None
+    _worker['payment_types_cache'] = catalog.get('payment_types') or get_payment_types_cache(output.cursor)
+    _worker['metrics'] = RunMetrics()
+    _worker['rollups'] = SalesRollups() if rollups else None
+    if async_writers:
+        _worker['pipeline'] = AsyncShardWriter(
+            db_url, async_writers, _worker['payment_types_cache'], run_id, _worker['metrics'],
+            output.partitioned
+        )
+    elif writers:
+        _worker['pipeline'] = ShardPipeline(
+            [DatabaseOutput(get_db_connection(db_url), loader) for _ in range(writers)],
+            _worker['payment_types_cache'], run_id, _worker['metrics']
+        )
+    else:
+        _worker['pipeline'] = None
+    output.commit()
+
+
+def init_sales_worker(db_url, catalog, loader, engine, pools, run_id, writers=0, file_output=None,
+                      async_writers=0, rollups=False):
+    """Pool initializer: every worker opens its own connection (or files)"""
+    set_faker_pools(pools)
+    if file_output:
+        output = file_output.for_worker()
+    else:
+        output = DatabaseOutput(get_db_connection(db_url), loader)
+    set_worker_state(output, catalog, engine, run_id, writers, db_url, loader, async_writers, rollups)
+
+
+def drain_worker():
+    """The worker's metrics and rollups (None without --rollups) since the previous drain"""
+    rollups = _worker['rollups']
+    return _worker['metrics'].drain(), rollups.drain() if rollups is not None else None
+
+
+def run_sales_day(task):
+    """Worker entry point: generate one (date, day multiplier, day seed, done shards) task"""
+    current_date, day_mult, seed, done_shards = task
+    try:
+        count, files = generate_day_sales(_worker, current_date, day_mult, seed, done_shards)
+    except Exception:
+        _worker['output'].rollback()
+        raise
+    return current_date, count, files
+
+
+def run_pooled_sales_day(task):
+    """Pool entry point: like run_sales_day, but only returns once the day is committed.
+
+    The worker's metrics and rollups since its previous day are returned with the day.
+    """
+    result = run_sales_day(task)
+    if _worker['pipeline']:
+        _worker['pipeline'].flush()
+    return result + drain_worker()
+
+
+def generate_sales(output, catalog, months=6, loader='copy', workers=1, db_url=None,
+                   engine='numpy', pools=None, seed=None, end_date=None, run_id=None, writers=0,
+                   metrics_log=None, metrics_file=None, metrics_interval=10.0, start_date=None,
+                   async_writers=0, rollups=None):
+    """Generate sales with realistic patterns.
+
+    Days run from start_date (default: `months` before end_date) to end_date.
+    Phase times, rows and shard latencies are exported to metrics_log
+    (JSON lines) and metrics_file (Prometheus text format) when given.
+    The rollups of every generated shard are merged into rollups (a
+    SalesRollups) when given.
+    Returns the sales count and the files written (file output only).
+    """
+    file_output = output if isinstance(output, FileOutput) else None
+    target = f"{file_output.file_format} files" if file_output else f"{loader} loader"
+    if async_writers:
+        target = f"asyncpg COPY, {async_writers} connection(s) per worker"
+    elif writers:
+        target += f", {writers} writer thread(s) per worker"
+    span = f"from {start_date:%Y-%m-%d}" if start_date else f"for {months} months"
+    print(f"Generating sales {span} "
+          f"({engine} engine, {target}, {workers} worker(s))...")
+
+    # Every day has its own seed, so the data does not depend on how days
+    # are spread across workers
+    if seed is None:
+        seed = random.getrandbits(64)
+    sales_seed = derive_seed(seed, 'sales')
+    done = completed_shards(output.conn, run_id) if run_id else {}
+    tasks = [
+        (current_date, day_mult, derive_seed(sales_seed, current_date.date()),
+         done.get(current_date.date(), set()))
+        for current_date, day_mult in plan_sales_days(months, derive_seed(seed, 'calendar'), end_date, start_date)
+    ]
+    if done:
+        print(f"  → resuming run {run_id}: {sum(len(s) for s in done.values()):,} shards already committed")
+    if output.partitioned and workers > 1:
+        tasks = interleave_months(tasks)
+
+    if workers > 1:
+        pool = multiprocessing.Pool(
+            workers, initializer=init_sales_worker,
+            initargs=(db_url, catalog, loader, engine, pools, run_id, writers, file_output, async_writers,
+                      rollups is not None)
+        )
+        results = pool.imap_unordered(run_pooled_sales_day, tasks)
+    else:
+        pool = None
+        set_worker_state(output, catalog, engine, run_id, writers, db_url, loader, async_writers,
+                         rollups is not None)
+        results = (run_sales_day(task) + drain_worker() for task in tasks)
+    exporter = MetricsExporter(metrics_log, metrics_file, metrics_interval, run_id)
+
+    total_sales = 0
+    start_time = datetime.now()
+    total_days = len(tasks)
+    days_processed = 0
+    last_date = None
+    files = []
+
+    try:
+        for current_date, count, day_files, day_metrics, day_rollups in results:
+            total_sales += count
+            files.extend(day_files)
+            days_processed += 1
+            last_date = max(last_date, current_date) if last_date else current_date
+            exporter.add(day_metrics)
+            if day_rollups:
+                rollups.merge(day_rollups)
+            exporter.update(total_sales, days_processed, total_days)
+
+            # Progress reporting
+            if days_processed % 7 == 0 or days_processed == total_days:
+                elapsed_time = (datetime.now() - start_time).total_seconds()
+                if elapsed_time > 0:
+                    sales_per_sec = total_sales / elapsed_time
+                    days_remaining = total_days - days_processed
+                    estimated_remaining_sec = (days_remaining / days_processed) * elapsed_time
+                    estimated_remaining_min = estimated_remaining_sec / 60
+
+                    print(f"  → {last_date.strftime('%Y-%m-%d')}: {total_sales:,} sales | "
+                          f"{days_processed}/{total_days} days | "
+                          f"{sales_per_sec:.0f} sales/s | "
+                          f"ETA: {estimated_remaining_min:.1f} min")
+    except BaseException:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        elif _worker['pipeline']:
+            # Commit the shards still queued (they are complete and checkpointed)
+            _worker['pipeline'].close()
+
+    if not pool:
+        # Writes the pipeline finished after the last day was returned
+        exporter.add(_worker['metrics'].drain())
+    exporter.update(total_sales, days_processed, total_days, force=True)
+
     print(f"✓ {total_sales:,} total sales generated")
-    return total_sales
+    exporter.print_summary()
+    return total_sales, files
 
 
-def generate_single_sale(sale_time, store_id, channel, customer_id, products, items, option_groups):
-    """Generate a single sale with all related data"""
+def generate_single_sale(batch, sale_time, store_id, channel, customer_id, samplers, items, option_groups):
+    """Generate a single sale with all related data into batch (money in integer cents)"""
+    sale = batch['count']
+    lines = batch['product_sales']
+    line_items = batch['item_product_sales']
     
     # Select 1-5 products
     num_products = min(5, max(1, int(random.expovariate(0.5)) + 1))
-    selected_products = random.choices(
-        products,
-        weights=[p['popularity'] for p in products],
-        k=num_products
-    )
+    selected_products = samplers['product'].draw_many(num_products)
     
     # Calculate financial values
     total_items_value = 0
-    products_data = []
     
     for product in selected_products:
+        line = len(lines['sale'])
         qty = random.randint(1, 3)
-        base_price = product['base_price']
+        base_price = product['base_price_cents']
         
         # Items/complements for this product (60% have customization)
-        items_data = []
         item_additions_price = 0
         
         if product['has_customization'] and random.random() > 0.4:
             num_items = random.randint(1, 4)
             for _ in range(num_items):
                 item = random.choice(items)
-                item_qty = 1
-                item_price = item['price']
+                item_price = item['price_cents']
                 item_additions_price += item_price
                 
-                items_data.append({
-                    'item_id': item['id'],
-                    'option_group_id': random.choice(option_groups) if random.random() > 0.5 else None,
-                    'quantity': item_qty,
-                    'additional_price': item_price,
-                    'price': item_price
-                })
+                line_items['product_sale'].append(line)
+                line_items['item_id'].append(item['id'])
+                line_items['option_group_id'].append(
+                    random.choice(option_groups) if random.random() > 0.5 else None
+                )
+                line_items['quantity'].append(1)
+                line_items['additional_price'].append(item_price)
+                line_items['price'].append(item_price)
         
         product_total = (base_price + item_additions_price) * qty
         total_items_value += product_total
         
-        products_data.append({
-            'product_id': product['id'],
-            'quantity': qty,
-            'base_price': base_price,
-            'total_price': product_total,
-            'items': items_data
-        })
+        lines['sale'].append(sale)
+        lines['product_id'].append(product['id'])
+        lines['quantity'].append(qty)
+        lines['base_price'].append(base_price)
+        lines['total_price'].append(product_total)
     
     # Discounts
     discount = 0
     discount_reason = None
     if random.random() < 0.2:
-        discount = round(total_items_value * random.uniform(0.05, 0.30), 2)
+        discount = round(total_items_value * random.uniform(0.05, 0.30))
         discount_reason = random.choice(DISCOUNT_REASONS)
     
     # Increases
     increase = 0
     if random.random() < 0.05:
-        increase = round(total_items_value * random.uniform(0.02, 0.10), 2)
+        increase = round(total_items_value * random.uniform(0.02, 0.10))
     
     # Delivery fee
     delivery_fee = 0
     if channel['type'] == 'D':
-        delivery_fee = random.choice([5.0, 7.0, 9.0, 12.0, 15.0])
+        delivery_fee = random.choice(DELIVERY_FEES)
     
     # Service tax
-    service_tax = round(total_items_value * 0.10, 2) if random.random() < 0.3 else 0
+    service_tax = round(total_items_value * 0.10) if random.random() < 0.3 else 0
     
     # Status
     status = random.choices(SALES_STATUS, STATUS_WEIGHTS)[0]
@@ -493,259 +1417,1352 @@ def generate_single_sale(sale_time, store_id, channel, customer_id, products, it
     delivery_sec = random.randint(600, 3600) if channel['type'] == 'D' and status == 'COMPLETED' else None
     
     # Delivery details (for delivery orders)
-    delivery_data = None
     if channel['type'] == 'D' and status == 'COMPLETED':
+        deliveries = batch['delivery_sales']
+        address = batch['delivery_addresses']
+
         # Brazilian coordinates (realistic range)
         lat = -23.5 + random.uniform(-10, 5)  # -33.5 to -18.5 (covers Brazil)
         long = -46.6 + random.uniform(-10, 10)  # -56.6 to -36.6
         
-        delivery_data = {
-            'courier_name': fake.name(),
-            'courier_phone': fake.phone_number(),
-            'courier_type': random.choice(COURIER_TYPES),
-            'delivery_type': random.choice(DELIVERY_TYPES),
-            'status': 'DELIVERED',
-            'delivery_fee': delivery_fee,
-            'courier_fee': round(delivery_fee * 0.6, 2),
-            'address': {
-                'street': fake.street_name(),
-                'number': str(random.randint(10, 9999)),
-                'complement': random.choice(['Apto 101', 'Casa', 'Bloco A', 'Fundos', None, None]) if random.random() > 0.5 else None,
-                'neighborhood': fake.bairro(),
-                'city': fake.city(),
-                'state': fake.estado_sigla(),
-                'postal_code': fake.postcode(),
-                'latitude': lat,
-                'longitude': long
-            }
-        }
+        deliveries['sale'].append(sale)
+        deliveries['courier_name'].append(fake_value('name'))
+        deliveries['courier_phone'].append(fake_value('phone_number'))
+        deliveries['courier_type'].append(random.choice(COURIER_TYPES))
+        deliveries['delivery_type'].append(random.choice(DELIVERY_TYPES))
+        deliveries['status'].append('DELIVERED')
+        deliveries['delivery_fee'].append(delivery_fee)
+        deliveries['courier_fee'].append(round(delivery_fee * 0.6))
+
+        address['street'].append(fake_value('street_name'))
+        address['number'].append(str(random.randint(10, 9999)))
+        address['complement'].append(random.choice(ADDRESS_COMPLEMENTS) if random.random() > 0.5 else None)
+        address['neighborhood'].append(fake_value('bairro'))
+        address['city'].append(fake_value('city'))
+        address['state'].append(fake_value('estado_sigla'))
+        address['postal_code'].append(fake_value('postcode'))
+        address['latitude'].append(lat)
+        address['longitude'].append(long)
     
     # Payment splits
-    payments = []
     if status == 'COMPLETED':
+        payments = batch['payments']
         num_payments = random.choices([1, 2], weights=[0.85, 0.15])[0]
         
         if num_payments == 1:
-            payments = [{'type': random.choice(PAYMENT_TYPES_LIST), 'value': value_paid}]
+            payments['sale'].append(sale)
+            payments['payment_type'].append(samplers['payment_type'].draw())
+            payments['value'].append(value_paid)
         else:
-            split = round(value_paid * random.uniform(0.3, 0.7), 2)
-            payments = [
-                {'type': random.choice(PAYMENT_TYPES_LIST[:3]), 'value': split},
-                {'type': random.choice(PAYMENT_TYPES_LIST), 'value': value_paid - split}
-            ]
+            split = round(value_paid * random.uniform(0.3, 0.7))
+            payments['sale'] += [sale, sale]
+            payments['payment_type'] += [samplers['split_payment_type'].draw(),
+                                         samplers['payment_type'].draw()]
+            payments['value'] += [split, value_paid - split]
     
+    sales = batch['sales']
+    sales['store_id'].append(store_id)
+    sales['customer_id'].append(customer_id)
+    sales['customer_name'].append(fake_value('name') if not customer_id else None)
+    sales['channel_id'].append(channel['id'])
+    sales['created_at'].append(sale_time)
+    sales['status'].append(status)
+    sales['total_items_value'].append(total_items_value)
+    sales['discount'].append(discount)
+    sales['discount_reason'].append(discount_reason)
+    sales['increase'].append(increase)
+    sales['delivery_fee'].append(delivery_fee)
+    sales['service_tax'].append(service_tax)
+    sales['total_amount'].append(total_amount)
+    sales['value_paid'].append(value_paid)
+    sales['production_sec'].append(production_sec)
+    sales['delivery_sec'].append(delivery_sec)
+    sales['people_qty'].append(random.randint(1, 8) if channel['type'] == 'P' else None)
+    batch['count'] = sale + 1
+
+
+def build_catalog_arrays(catalog):
+    """Pack the catalog into NumPy arrays for the vectorized engine (a customer range stays a range)"""
+    customers = catalog['customers']
+    channels = catalog['channels']
+    products = catalog['products']
+    items = catalog['items']
+
     return {
+        'store_ids': np.array(catalog['stores']),
+        'customer_ids': customers if isinstance(customers, range) else np.asarray(customers, dtype=np.int64),
+        'channel_ids': np.array([c['id'] for c in channels]),
+        'channel_is_delivery': np.array([c['type'] == 'D' for c in channels]),
+        'channel_is_presencial': np.array([c['type'] == 'P' for c in channels]),
+        'product_ids': np.array([p['id'] for p in products]),
+        'product_prices': np.array([p['base_price_cents'] for p in products], dtype=np.int64),
+        'product_customizable': np.array([p['has_customization'] for p in products]),
+        'item_ids': np.array([i['id'] for i in items]),
+        'item_prices': np.array([i['price_cents'] for i in items], dtype=np.int64),
+        'option_group_ids': np.array(catalog['option_groups']),
+    }
+
+
+def round_cents(amounts):
+    """Float amounts of cents rounded to int64 cents (half to even, like round())"""
+    return np.round(amounts).astype(np.int64)
+
+
+def masked_list(values, mask):
+    """Column as a Python list with None where mask is False"""
+    return [v if m else None for v, m in zip(values.tolist(), mask.tolist())]
+
+
+def synthesize_sales_columns(rng, n, current_date, arrays, samplers):
+    """Draw `n` sales of one day at once, mirroring generate_single_sale.
+
+    Returns one dict of columns per table, money in int64 cents. Child
+    tables reference their parent by position in the batch (`sale`,
+    `product_sale`); the insert path turns positions into keys.
+    """
+    # Sale time, store, channel and customer
+    seconds = (samplers['hour'].sample_indices(rng, n) * 3600
+               + rng.integers(0, 60, n) * 60 + rng.integers(0, 60, n))
+    created_at = (np.datetime64(current_date, 'us') + seconds.astype('timedelta64[s]')).tolist()
+    store_id = rng.choice(arrays['store_ids'], n)
+    channel_idx = samplers['channel'].sample_indices(rng, n)
+    is_delivery = arrays['channel_is_delivery'][channel_idx]
+    has_customer = rng.random(n) > 0.3
+    if len(arrays['customer_ids']):
+        customer_id = sample_ids(rng, arrays['customer_ids'], n)
+    else:
+        customer_id = np.zeros(n, dtype=np.int64)
+        has_customer[:] = False
+
+    # Select 1-5 products per sale
+    products_per_sale = np.minimum(5, rng.exponential(2.0, n).astype(np.int64) + 1)
+    line_sale = np.repeat(np.arange(n), products_per_sale)
+    m = len(line_sale)
+    product_idx = samplers['product'].sample_indices(rng, m)
+    quantity = rng.integers(1, 4, m)
+    base_price = arrays['product_prices'][product_idx]
+
+    # Items/complements (60% of customizable products get 1-4 items)
+    customized = arrays['product_customizable'][product_idx] & (rng.random(m) > 0.4)
+    items_per_line = np.where(customized, rng.integers(1, 5, m), 0)
+    item_line = np.repeat(np.arange(m), items_per_line)
+    k = len(item_line)
+    item_idx = rng.integers(0, len(arrays['item_ids']), k)
+    item_price = arrays['item_prices'][item_idx]
+    option_group_id = rng.choice(arrays['option_group_ids'], k)
+    has_option_group = rng.random(k) > 0.5
+
+    additions = np.bincount(item_line, weights=item_price, minlength=m).astype(np.int64)
+    product_total = (base_price + additions) * quantity
+    total_items_value = np.bincount(line_sale, weights=product_total, minlength=n).astype(np.int64)
+
+    # Discounts, increases, delivery fee and service tax
+    has_discount = rng.random(n) < 0.2
+    discount = np.where(has_discount, round_cents(total_items_value * rng.uniform(0.05, 0.30, n)), 0)
+    discount_reason = np.array(DISCOUNT_REASONS, dtype=object)[rng.integers(0, len(DISCOUNT_REASONS), n)]
+    increase = np.where(rng.random(n) < 0.05,
+                        round_cents(total_items_value * rng.uniform(0.02, 0.10, n)), 0)
+    delivery_fee = np.where(is_delivery, rng.choice(DELIVERY_FEES, n), 0)
+    service_tax = np.where(rng.random(n) < 0.3, round_cents(total_items_value * 0.10), 0)
+
+    # Status and totals
+    completed = rng.random(n) < STATUS_WEIGHTS[0]
+    total_amount = total_items_value - discount + increase + delivery_fee + service_tax
+    value_paid = np.where(completed, total_amount, 0)
+    delivered = is_delivery & completed
+    anonymous_names = iter(fake_values(rng, 'name', n - int(has_customer.sum())))
+
+    sales = {
         'store_id': store_id,
-        'customer_id': customer_id,
-        'customer_name': fake.name() if not customer_id else None,
-        'channel_id': channel['id'],
-        'created_at': sale_time,
-        'status': status,
+        'customer_id': masked_list(customer_id, has_customer),
+        'channel_id': arrays['channel_ids'][channel_idx],
+        'customer_name': [None if c else next(anonymous_names) for c in has_customer.tolist()],
+        'created_at': created_at,
+        'status': np.where(completed, SALES_STATUS[0], SALES_STATUS[1]).tolist(),
         'total_items_value': total_items_value,
         'discount': discount,
-        'discount_reason': discount_reason,
+        'discount_reason': masked_list(discount_reason, has_discount),
         'increase': increase,
         'delivery_fee': delivery_fee,
         'service_tax': service_tax,
         'total_amount': total_amount,
         'value_paid': value_paid,
-        'production_sec': production_sec,
-        'delivery_sec': delivery_sec,
-        'people_qty': random.randint(1, 8) if channel['type'] == 'P' else None,
-        'products': products_data,
-        'delivery': delivery_data,
-        'payments': payments
+        'production_sec': masked_list(rng.integers(300, 2401, n), completed),
+        'delivery_sec': masked_list(rng.integers(600, 3601, n), delivered),
+        'people_qty': masked_list(rng.integers(1, 9, n),
+                                  arrays['channel_is_presencial'][channel_idx]),
     }
 
+    product_sales = {
+        'sale': line_sale,
+        'product_id': arrays['product_ids'][product_idx],
+        'quantity': quantity,
+        'base_price': base_price,
+        'total_price': product_total,
+    }
+
+    item_product_sales = {
+        'product_sale': item_line,
+        'item_id': arrays['item_ids'][item_idx],
+        'option_group_id': masked_list(option_group_id, has_option_group),
+        'quantity': np.ones(k, dtype=np.int64),
+        'additional_price': item_price,
+        'price': item_price,
+    }
+
+    # Delivery details (for completed delivery orders)
+    delivery_sale = np.flatnonzero(delivered)
+    d = len(delivery_sale)
+    fee = delivery_fee[delivery_sale]
+    complement = np.array(ADDRESS_COMPLEMENTS, dtype=object)[rng.integers(0, len(ADDRESS_COMPLEMENTS), d)]
+    delivery_sales = {
+        'sale': delivery_sale,
+        'courier_name': fake_values(rng, 'name', d),
+        'courier_phone': fake_values(rng, 'phone_number', d),
+        'courier_type': np.array(COURIER_TYPES)[rng.integers(0, len(COURIER_TYPES), d)].tolist(),
+        'delivery_type': np.array(DELIVERY_TYPES)[rng.integers(0, len(DELIVERY_TYPES), d)].tolist(),
+        'status': ['DELIVERED'] * d,
+        'delivery_fee': fee,
+        'courier_fee': round_cents(fee * 0.6),
+    }
+    delivery_addresses = {
+        'street': fake_values(rng, 'street_name', d),
+        'number': rng.integers(10, 10000, d).astype(str).tolist(),
+        'complement': masked_list(complement, rng.random(d) > 0.5),
+        'neighborhood': fake_values(rng, 'bairro', d),
+        'city': fake_values(rng, 'city', d),
+        'state': fake_values(rng, 'estado_sigla', d),
+        'postal_code': fake_values(rng, 'postcode', d),
+        'latitude': -23.5 + rng.uniform(-10, 5, d),
+        'longitude': -46.6 + rng.uniform(-10, 10, d),
+    }
+
+    # Payment splits: 85% single payment, 15% split in two
+    paid_sale = np.flatnonzero(completed)
+    paid = value_paid[paid_sale]
+    is_split = rng.random(len(paid_sale)) < 0.15
+    split = round_cents(paid * rng.uniform(0.3, 0.7, len(paid_sale)))
+    first_type = np.where(is_split,
+                          samplers['split_payment_type'].sample_indices(rng, len(paid_sale)),
+                          samplers['payment_type'].sample_indices(rng, len(paid_sale)))
+    second_type = samplers['payment_type'].sample_indices(rng, int(is_split.sum()))
+
+    payment_sale = np.concatenate([paid_sale, paid_sale[is_split]])
+    payment_type = np.concatenate([first_type, second_type])
+    payment_value = np.concatenate([np.where(is_split, split, paid), (paid - split)[is_split]])
+    order = np.argsort(payment_sale, kind='stable')
+    payments = {
+        'sale': payment_sale[order],
+        'payment_type': np.array(PAYMENT_TYPES_LIST)[payment_type[order]].tolist(),
+        'value': payment_value[order],
+    }
+
+    return {
+        'count': n,
+        'sales': sales,
+        'product_sales': product_sales,
+        'item_product_sales': item_product_sales,
+        'delivery_sales': delivery_sales,
+        'delivery_addresses': delivery_addresses,
+        'payments': payments,
+    }
+
+
+# Column lists for the sales fact tables (shared by every loader)
+SALES_COLUMNS = (
+    'id', 'store_id', 'customer_id', 'channel_id', 'customer_name',
+    'created_at', 'sale_status_desc',
+    'total_amount_items', 'total_discount', 'total_increase',
+    'delivery_fee', 'service_tax_fee', 'total_amount', 'value_paid',
+    'production_seconds', 'delivery_seconds',
+    'discount_reason', 'people_quantity', 'origin'
+)
+PRODUCT_SALES_COLUMNS = ('id', 'sale_id', 'product_id', 'quantity', 'base_price', 'total_price')
+ITEM_PRODUCT_SALES_COLUMNS = (
+    'product_sale_id', 'item_id', 'option_group_id',
+    'quantity', 'additional_price', 'price', 'amount'
+)
+DELIVERY_SALES_COLUMNS = (
+    'id', 'sale_id', 'courier_name', 'courier_phone', 'courier_type',
+    'delivery_type', 'status', 'delivery_fee', 'courier_fee'
+)
+DELIVERY_ADDRESSES_COLUMNS = (
+    'sale_id', 'delivery_sale_id', 'street', 'number', 'complement',
+    'neighborhood', 'city', 'state', 'postal_code', 'latitude', 'longitude'
+)
+PAYMENTS_COLUMNS = ('sale_id', 'payment_type_id', 'value')
+
+def batch_write_rows(cursor, table, columns, rows):
+    """Write rows with execute_batch (one INSERT statement per row)"""
+    placeholders = ','.join(['%s'] * len(columns))
+    execute_batch(cursor, f"""
+        INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})
+    """, rows, page_size=1000)
+
+
+def copy_write_rows(cursor, table, columns, rows):
+    """Stream rows with COPY ... FROM STDIN from an in-memory buffer"""
+    buffer = io.StringIO()
+    buffer.writelines(
+        '\t'.join([format_copy_value(v) for v in row]) + '\n'
+        for row in rows
+    )
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+# Loader modes selectable from the CLI
+LOADERS = {
+    'batch': batch_write_rows,
+    'copy': copy_write_rows,
+}
+
+
+class IdAllocator:
+    """Assigns primary keys in Python from id blocks reserved on the table sequences.
+
+    nextval() is atomic and never rolled back, so any number of loaders can
+    share the database without handing out the same key twice.
+    """
+
+    def __init__(self, conn, block_size=20000):
+        self.cursor = conn.cursor()
+        self.block_size = block_size
+        self.reserved = {}
+
+    def take(self, table, count, exact=False):
+        """Return `count` unused ids for table, reserving a new block when needed"""
+        ids = self.reserved.setdefault(table, [])
+        if len(ids) < count:
+            size = count - len(ids) if exact else max(self.block_size, count - len(ids))
+            self.cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                (table, size)
+            )
+            ids.extend(row[0] for row in self.cursor.fetchall())
+        taken = ids[:count]
+        del ids[:count]
+        return taken
+
+    def take_range(self, table, count):
+        """Reserve `count` consecutive ids for table by moving its sequence, returned as a range.
+
+        Only for tables nothing else is writing at the time (the catalog):
+        a nextval() from another session between the two calls would land
+        inside the range.
+        """
+        if not count:
+            return range(0)
+        self.cursor.execute(
+            "SELECT setval(seq, nextval(seq) + %s - 1) FROM pg_get_serial_sequence(%s, 'id') AS seq",
+            (count, table)
+        )
+        last = self.cursor.fetchone()[0]
+        return range(last - count + 1, last + 1)
+
+
+class AsyncIdAllocator:
+    """IdAllocator for asyncio writers: id blocks are reserved through an asyncpg pool.
+
+    take() stays synchronous (insert_sales_batch calls it), so callers first
+    await reserve() with the counts they are about to take.
+    """
+
+    def __init__(self, pool, block_size=20000):
+        self.pool = pool
+        self.block_size = block_size
+        self.reserved = {}
+        self.lock = asyncio.Lock()
+
+    async def reserve(self, counts):
+        """Make sure {table: count} ids are reserved"""
+        async with self.lock:
+            for table, count in counts.items():
+                ids = self.reserved.setdefault(table, [])
+                if len(ids) < count:
+                    ids.extend(row[0] for row in await self.pool.fetch(
+                        "SELECT nextval(pg_get_serial_sequence($1, 'id')) FROM generate_series(1, $2)",
+                        table, max(self.block_size, count - len(ids))
+                    ))
+
+    def take(self, table, count, exact=False):
+        ids = self.reserved.get(table, [])
+        if len(ids) < count:
+            raise RuntimeError(f"{count} {table} ids taken without reserve()")
+        taken = ids[:count]
+        del ids[:count]
+        return taken
+
+
+class DatabaseOutput:
+    """Writes rows to Postgres with one of the LOADERS; keys come from the table sequences.
+
+    When sales is partitioned (--partitioned), shards are written straight
+    into their month's partitions.
+    """
+
+    def __init__(self, conn, loader='copy'):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.write_rows = LOADERS[loader]
+        self.ids = IdAllocator(conn)
+        self.partitioned = sales_partitioned(self.cursor)
+
+    def start_part(self, name):
+        pass
+
+    def end_part(self):
+        return []
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+
+def format_cents(cents):
+    """Integer cents as NUMERIC text: 1234 -> '12.34'"""
+    sign = '-' if cents < 0 else ''
+    whole, frac = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{frac:02d}"
+
+
+def cents_column(cents):
+    """Cents (int64 array or list of ints) as NUMERIC text values"""
+    return list(map(format_cents, cents.tolist() if isinstance(cents, np.ndarray) else cents))
+
+
+def float_column(cents):
+    """Cents (int64 array or list of ints) as FLOAT values"""
+    return np.divide(cents, 100)
+
+
+def position_list(positions):
+    """Batch positions (NumPy array or list) as a list of ints"""
+    return positions.tolist() if isinstance(positions, np.ndarray) else positions
+
+
+def column_rows(*columns):
+    """Zip columns (NumPy arrays, lists or repeats) into row tuples"""
+    return list(zip(*(c.tolist() if isinstance(c, np.ndarray) else c for c in columns)))
+
+
+def batch_id_counts(batch):
+    """Keys insert_sales_batch takes per table for batch"""
+    return {
+        'sales': batch['count'],
+        'product_sales': len(batch['product_sales']['sale']),
+        'delivery_sales': len(batch['delivery_sales']['sale']),
+    }
+
+
+def insert_sales_batch(cursor, batch, payment_types_cache, id_allocator,
+                       write_rows=batch_write_rows, partition=None):
+    """Insert a columnar batch from either engine using the given row writer.
+
+    With a partition (month suffix, see month_partition) the partitioned
+    tables are written directly, with their sale_created_at key.
+    """
+    sales = batch['sales']
+    product_sales = batch['product_sales']
+    items = batch['item_product_sales']
+    deliveries = batch['delivery_sales']
+    addresses = batch['delivery_addresses']
+    payments = batch['payments']
+
+    # Assign keys up front and map batch positions to them
+    sale_ids = np.array(id_allocator.take('sales', batch['count']), dtype=np.int64)
+    product_sale_ids = np.array(
+        id_allocator.take('product_sales', len(product_sales['sale'])), dtype=np.int64
+    )
+    delivery_sale_ids = np.array(
+        id_allocator.take('delivery_sales', len(deliveries['sale'])), dtype=np.int64
+    )
+
+    write_rows(cursor, partition_table('sales', partition), SALES_COLUMNS, column_rows(
+        sale_ids, sales['store_id'], sales['customer_id'], sales['channel_id'],
+        sales['customer_name'], sales['created_at'], sales['status'],
+        cents_column(sales['total_items_value']), cents_column(sales['discount']),
+        cents_column(sales['increase']), cents_column(sales['delivery_fee']),
+        cents_column(sales['service_tax']), cents_column(sales['total_amount']),
+        cents_column(sales['value_paid']), sales['production_sec'], sales['delivery_sec'],
+        sales['discount_reason'], sales['people_qty'], itertools.repeat('POS')
+    ))
+
+    line_columns = [
+        product_sale_ids, sale_ids[product_sales['sale']], product_sales['product_id'],
+        product_sales['quantity'], float_column(product_sales['base_price']),
+        float_column(product_sales['total_price'])
+    ]
+    item_columns = [
+        product_sale_ids[items['product_sale']], items['item_id'], items['option_group_id'],
+        items['quantity'], float_column(items['additional_price']), float_column(items['price']),
+        itertools.repeat(1)
+    ]
+    key_columns = ()
+    if partition:
+        # Partition key of the child rows: the created_at of their sale
+        line_created_at = [sales['created_at'][i] for i in position_list(product_sales['sale'])]
+        line_columns.append(line_created_at)
+        item_columns.append([line_created_at[i] for i in position_list(items['product_sale'])])
+        key_columns = ('sale_created_at',)
+
+    if len(product_sale_ids):
+        write_rows(cursor, partition_table('product_sales', partition),
+                   PRODUCT_SALES_COLUMNS + key_columns, column_rows(*line_columns))
+
+    if len(items['product_sale']):
+        write_rows(cursor, partition_table('item_product_sales', partition),
+                   ITEM_PRODUCT_SALES_COLUMNS + key_columns, column_rows(*item_columns))
+
+    if len(delivery_sale_ids):
+        delivery_sale_sale_ids = sale_ids[deliveries['sale']]
+        write_rows(cursor, 'delivery_sales', DELIVERY_SALES_COLUMNS, column_rows(
+            delivery_sale_ids, delivery_sale_sale_ids, deliveries['courier_name'],
+            deliveries['courier_phone'], deliveries['courier_type'], deliveries['delivery_type'],
+            deliveries['status'], float_column(deliveries['delivery_fee']),
+            float_column(deliveries['courier_fee'])
+        ))
+        # Ensure coordinates are within valid range for Brazil
+        write_rows(cursor, 'delivery_addresses', DELIVERY_ADDRESSES_COLUMNS, column_rows(
+            delivery_sale_sale_ids, delivery_sale_ids, addresses['street'], addresses['number'],
+            addresses['complement'], addresses['neighborhood'], addresses['city'],
+            addresses['state'], addresses['postal_code'],
+            np.clip(addresses['latitude'], -33.0, -5.0),
+            np.clip(addresses['longitude'], -74.0, -34.0)
+        ))
+
+    payment_type_ids = [payment_types_cache.get(pt) for pt in payments['payment_type']]
+    payments_data = [
+        row for row in column_rows(sale_ids[payments['sale']], payment_type_ids, cents_column(payments['value']))
+        if row[1]
+    ]
+    if payments_data:
+        write_rows(cursor, 'payments', PAYMENTS_COLUMNS, payments_data)
 
-def insert_sales_batch(cursor, sales_batch, payment_types_cache):
-    """Insert batch of sales with all related data using optimized batch inserts"""
-
-    # Insert sales
-    sales_data = [(
-        s['store_id'], s['customer_id'], s['channel_id'],
-        s['customer_name'], s['created_at'], s['status'],
-        Decimal(str(s['total_items_value'])),
-        Decimal(str(s['discount'])),
-        Decimal(str(s['increase'])),
-        Decimal(str(s['delivery_fee'])),
-        Decimal(str(s['service_tax'])),
-        Decimal(str(s['total_amount'])),
-        Decimal(str(s['value_paid'])),
-        s['production_sec'], s['delivery_sec'],
-        s['discount_reason'], s['people_qty'], 'POS'
-    ) for s in sales_batch]
-
-    execute_batch(cursor, """
-        INSERT INTO sales (
-            store_id, customer_id, channel_id, customer_name,
-            created_at, sale_status_desc,
-            total_amount_items, total_discount, total_increase,
-            delivery_fee, service_tax_fee, total_amount, value_paid,
-            production_seconds, delivery_seconds,
-            discount_reason, people_quantity, origin
-        ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    """, sales_data, page_size=500)
-
-    # Get inserted sale IDs
-    cursor.execute("""
-        SELECT id FROM sales
-        ORDER BY id DESC
-        LIMIT %s
-    """, (len(sales_batch),))
-    sale_ids = [row[0] for row in cursor.fetchall()]
-    sale_ids.reverse()
-
-    # Prepare batch data for product_sales
-    product_sales_data = []
-    product_sales_mapping = []  # To track which sale and product each product_sale belongs to
-
-    for sale_id, sale in zip(sale_ids, sales_batch):
-        for prod_idx, prod_data in enumerate(sale['products']):
-            product_sales_data.append((
-                sale_id, prod_data['product_id'],
-                prod_data['quantity'], prod_data['base_price'],
-                prod_data['total_price']
-            ))
-            product_sales_mapping.append({
-                'sale_id': sale_id,
-                'prod_idx': prod_idx,
-                'items': prod_data['items']
-            })
 
-    # Insert product_sales in batch
-    if product_sales_data:
-        execute_batch(cursor, """
-            INSERT INTO product_sales (
-                sale_id, product_id, quantity, base_price, total_price
-            ) VALUES (%s,%s,%s,%s,%s)
-        """, product_sales_data, page_size=1000)
+# Sale synthesis engines: shard builders returning the same columnar batch
+SALES_ENGINES = {
+    'python': build_sales_shard,
+    'numpy': build_sales_shard_columns,
+}
+
+
+# Content of the rows written for sales with id > %s, without surrogate keys,
+# used to prove that every loader writes exactly the same data
+PARITY_QUERIES = {
+    'sales': """
+        SELECT store_id, customer_id, channel_id, customer_name, created_at,
+               sale_status_desc, total_amount_items, total_discount, total_increase,
+               delivery_fee, service_tax_fee, total_amount, value_paid,
+               production_seconds, delivery_seconds, discount_reason, people_quantity
+        FROM sales WHERE id > %s ORDER BY id
+    """,
+    'product_sales': """
+        SELECT s.created_at, ps.product_id, ps.quantity, ps.base_price, ps.total_price
+        FROM product_sales ps JOIN sales s ON s.id = ps.sale_id
+        WHERE ps.sale_id > %s ORDER BY ps.id
+    """,
+    'item_product_sales': """
+        SELECT s.created_at, ps.product_id, ips.item_id, ips.option_group_id,
+               ips.quantity, ips.additional_price, ips.price, ips.amount
+        FROM item_product_sales ips
+        JOIN product_sales ps ON ps.id = ips.product_sale_id
+        JOIN sales s ON s.id = ps.sale_id
+        WHERE ps.sale_id > %s ORDER BY ips.id
+    """,
+    'delivery_sales': """
+        SELECT s.created_at, d.courier_name, d.courier_phone, d.courier_type,
+               d.delivery_type, d.status, d.delivery_fee, d.courier_fee
+        FROM delivery_sales d JOIN sales s ON s.id = d.sale_id
+        WHERE d.sale_id > %s ORDER BY d.id
+    """,
+    'delivery_addresses': """
+        SELECT s.created_at, d.courier_name, a.street, a.number, a.complement,
+               a.neighborhood, a.city, a.state, a.postal_code, a.latitude, a.longitude
+        FROM delivery_addresses a
+        JOIN sales s ON s.id = a.sale_id
+        JOIN delivery_sales d ON d.id = a.delivery_sale_id
+        WHERE a.sale_id > %s ORDER BY a.id
+    """,
+    'payments': """
+        SELECT s.created_at, p.payment_type_id, p.value
+        FROM payments p JOIN sales s ON s.id = p.sale_id
+        WHERE p.sale_id > %s ORDER BY p.id
+    """,
+}
+
+
+def check_loader_parity(conn, args, sample_size=2000):
+    """Load the same sample through every loader, compare rows and sales/s.
+
+    Everything goes to temporary copies of the tables (create_plan_tables),
+    catalog included, so nothing is left in the database.
+    """
+    print(f"Checking loader parity with {sample_size:,} sales...")
+    create_plan_tables(conn)
+    output = DatabaseOutput(conn, 'copy')
+    catalog = create_catalog(output, args)
+    catalog['customers'], _ = generate_customers(
+        output, PLAN_SAMPLE_CUSTOMERS, derive_seed(args.seed, 'customers'), end_date=args.end_date
+    )
+    pools = None
+    if args.pool_size > 0:
+        pools = build_faker_pools(args.pool_size, derive_seed(args.seed, 'faker_pools'), args.pool_cache)
+    set_faker_pools(pools)
 
-        # Get inserted product_sale IDs
+    cursor = conn.cursor()
+    payment_types_cache = get_payment_types_cache(cursor)
+    id_allocator = IdAllocator(conn)
+    conn.commit()
+
+    # One sample batch shared by every loader
+    samplers = build_samplers(catalog)
+    seed_entity(args.seed, 'sales')
+    sample = []
+    for start in range(0, sample_size, SALES_SHARD_SIZE):
+        batch = new_sales_batch()
+        for _ in range(min(SALES_SHARD_SIZE, sample_size - start)):
+            draw_sale(batch, args.end_date, catalog, samplers)
+        sample.append(batch)
+
+    results = {}
+    for name, write_rows in LOADERS.items():
+        try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM sales")
+            last_sale_id = cursor.fetchone()[0]
+
+            started = time.perf_counter()
+            for batch in sample:
+                insert_sales_batch(cursor, batch, payment_types_cache, id_allocator, write_rows)
+            elapsed = time.perf_counter() - started
+
+            rows = {}
+            for table, query in PARITY_QUERIES.items():
+                cursor.execute(query, (last_sale_id,))
+                rows[table] = cursor.fetchall()
+            results[name] = (sample_size / elapsed, rows)
+        finally:
+            conn.rollback()
+
+    baseline_name = next(iter(LOADERS))
+    baseline_rate, baseline_rows = results[baseline_name]
+    parity_ok = True
+    for name, (rate, rows) in results.items():
+        mismatched = [t for t in PARITY_QUERIES if rows[t] != baseline_rows[t]]
+        parity_ok = parity_ok and not mismatched
+        status = f"✗ differs in {', '.join(mismatched)}" if mismatched else "✓ identical rows"
+        print(f"  → {name}: {rate:,.0f} sales/s ({rate / baseline_rate:.1f}x {baseline_name}) | {status}")
+
+    if not parity_ok:
+        raise RuntimeError("Loaders wrote different data for the same sales")
+    print("✓ Loader parity check passed")
+    return {name: rate for name, (rate, _) in results.items()}
+
+
+# Tables that receive the bulk of the rows; --bulk-load strips them of keys,
+# indexes and foreign keys while loading
+BULK_LOAD_TABLES = [
+    'customers', 'sales', 'product_sales', 'item_product_sales',
+    'delivery_sales', 'delivery_addresses', 'payments'
+]
+
+# Objects dropped by --bulk-load, kept in the database until rebuilt so an
+# interrupted run can still restore them (rebuilt in phase order)
+DEFERRED_DDL = """
+    CREATE TABLE IF NOT EXISTS generator_deferred_ddl (
+        position INTEGER PRIMARY KEY,
+        phase INTEGER NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        name TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        drop_sql TEXT NOT NULL,
+        create_sql TEXT NOT NULL,
+        validate_sql TEXT
+    );
+"""
+
+# Rebuild phases: tables back to logged, then keys, then indexes, then
+# foreign keys (validated once every referenced key exists)
+DEFERRED_PHASES = {'logged': 0, 'key': 1, 'index': 2, 'foreign_key': 3}
+
+DEFERRABLE_OBJECTS_QUERY = """
+    SELECT 'foreign_key', c.conname, c.conrelid::regclass::text,
+           format('ALTER TABLE %%s DROP CONSTRAINT %%I', c.conrelid::regclass, c.conname),
+           format('ALTER TABLE %%s ADD CONSTRAINT %%I %%s NOT VALID',
+                  c.conrelid::regclass, c.conname, pg_get_constraintdef(c.oid)),
+           format('ALTER TABLE %%s VALIDATE CONSTRAINT %%I', c.conrelid::regclass, c.conname)
+    FROM pg_constraint c
+    WHERE c.contype = 'f' AND (c.conrelid = ANY(%(tables)s::regclass[])
+                               OR c.confrelid = ANY(%(tables)s::regclass[]))
+    UNION ALL
+    SELECT 'key', c.conname, c.conrelid::regclass::text,
+           format('ALTER TABLE %%s DROP CONSTRAINT %%I', c.conrelid::regclass, c.conname),
+           format('ALTER TABLE %%s ADD CONSTRAINT %%I %%s',
+                  c.conrelid::regclass, c.conname, pg_get_constraintdef(c.oid)),
+           NULL
+    FROM pg_constraint c
+    WHERE c.contype IN ('p', 'u', 'x') AND c.conrelid = ANY(%(tables)s::regclass[])
+    UNION ALL
+    SELECT 'index', i.indexrelid::regclass::text, i.indrelid::regclass::text,
+           format('DROP INDEX %%s', i.indexrelid::regclass),
+           pg_get_indexdef(i.indexrelid),
+           NULL
+    FROM pg_index i
+    WHERE i.indrelid = ANY(%(tables)s::regclass[])
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c
+                      WHERE c.conindid = i.indexrelid AND c.contype IN ('p', 'u', 'x'))
+"""
+
+
+def defer_constraints(conn, unlogged=False, tables=BULK_LOAD_TABLES):
+    """Record, then drop the keys, indexes and foreign keys of the bulk tables.
+
+    The definitions go to generator_deferred_ddl in the same transaction as
+    the drops; restore_deferred() rebuilds them after the load.
+    """
+    cursor = conn.cursor()
+    cursor.execute(DEFERRED_DDL)
+    cursor.execute("SELECT count(*) FROM generator_deferred_ddl")
+    pending = cursor.fetchone()[0]
+    if pending:
+        conn.commit()
+        print(f"✓ Bulk load: {pending} objects already deferred by an earlier run")
+        return
+
+    cursor.execute(DEFERRABLE_OBJECTS_QUERY, {'tables': tables})
+    objects = cursor.fetchall()
+    if unlogged:
+        objects += [
+            ('logged', table, table, f"ALTER TABLE {table} SET UNLOGGED", f"ALTER TABLE {table} SET LOGGED", None)
+            for table in tables
+        ]
+
+    # Drop foreign keys before the keys they reference
+    drop_order = ['foreign_key', 'key', 'index', 'logged']
+    objects.sort(key=lambda o: drop_order.index(o[0]))
+    for position, (kind, name, table, drop_sql, create_sql, validate_sql) in enumerate(objects):
         cursor.execute("""
-            SELECT id FROM product_sales
-            ORDER BY id DESC
-            LIMIT %s
-        """, (len(product_sales_data),))
-        product_sale_ids = [row[0] for row in cursor.fetchall()]
-        product_sale_ids.reverse()
-
-        # Prepare batch data for item_product_sales
-        item_product_sales_data = []
-        for product_sale_id, mapping in zip(product_sale_ids, product_sales_mapping):
-            for item_data in mapping['items']:
-                item_product_sales_data.append((
-                    product_sale_id, item_data['item_id'],
-                    item_data['option_group_id'],
-                    item_data['quantity'], item_data['additional_price'],
-                    item_data['price'], 1
-                ))
-
-        # Insert item_product_sales in batch
-        if item_product_sales_data:
-            execute_batch(cursor, """
-                INSERT INTO item_product_sales (
-                    product_sale_id, item_id, option_group_id,
-                    quantity, additional_price, price, amount
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s)
-            """, item_product_sales_data, page_size=1000)
-
-    # Prepare batch data for delivery_sales and delivery_addresses
-    delivery_sales_data = []
-    delivery_addresses_data = []
-    delivery_sale_mapping = []  # To track sale_id for each delivery
-
-    for sale_id, sale in zip(sale_ids, sales_batch):
-        if sale['delivery']:
-            d = sale['delivery']
-            delivery_sales_data.append((
-                sale_id, d['courier_name'], d['courier_phone'],
-                d['courier_type'], d['delivery_type'], d['status'],
-                d['delivery_fee'], d['courier_fee']
-            ))
-            delivery_sale_mapping.append({
-                'sale_id': sale_id,
-                'address': d['address']
-            })
+            INSERT INTO generator_deferred_ddl
+                (position, phase, kind, name, table_name, drop_sql, create_sql, validate_sql)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (position, DEFERRED_PHASES[kind], kind, name, table, drop_sql, create_sql, validate_sql))
+        cursor.execute(drop_sql)
+    conn.commit()
+
+    counts = {kind: sum(1 for o in objects if o[0] == kind) for kind in drop_order}
+    print(f"✓ Bulk load: dropped {counts['key']} keys, {counts['index']} indexes and "
+          f"{counts['foreign_key']} foreign keys" + (", tables set UNLOGGED" if unlogged else ""))
+
+
+def run_deferred(db_url, position, kind, name, table, drop_sql, create_sql, validate_sql):
+    """Rebuild one deferred object on its own connection, returning its build time"""
+    conn = get_db_connection(db_url)
+    try:
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        cursor.execute(create_sql)
+        if validate_sql:
+            # Add NOT VALID first (brief locks on both tables), then scan
+            conn.commit()
+            try:
+                cursor.execute(validate_sql)
+            except Exception:
+                # Leave it dropped, as recorded, so the next run can retry
+                conn.rollback()
+                cursor.execute(drop_sql)
+                conn.commit()
+                raise
+        cursor.execute("DELETE FROM generator_deferred_ddl WHERE position = %s", (position,))
+        conn.commit()
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def restore_deferred(conn, db_url, jobs=4):
+    """Rebuild what defer_constraints() dropped, each phase in parallel across connections.
+
+    Every object's build time is reported; failures are raised after the
+    phase, and the failed objects stay recorded for the next run to retry.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('generator_deferred_ddl') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        conn.commit()
+        return
+    cursor.execute("""
+        SELECT phase, position, kind, name, table_name, drop_sql, create_sql, validate_sql
+        FROM generator_deferred_ddl ORDER BY phase, position
+    """)
+    objects = cursor.fetchall()
+    conn.commit()
+    if not objects:
+        return
+
+    print(f"Rebuilding {len(objects)} deferred objects ({jobs} connections)...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(jobs) as executor:
+        for phase in sorted({o[0] for o in objects}):
+            futures = [
+                (o, executor.submit(run_deferred, db_url, *o[1:]))
+                for o in objects if o[0] == phase
+            ]
+            failed = []
+            for (_, _, kind, name, table, _, _, _), future in futures:
+                try:
+                    elapsed = future.result()
+                    print(f"  → {kind} {name} on {table}: {elapsed:.1f}s")
+                except Exception as e:
+                    print(f"  ✗ {kind} {name} on {table}: {e}")
+                    failed.append(name)
+            if failed:
+                raise RuntimeError(f"Could not rebuild {', '.join(failed)} "
+                                   f"(still recorded in generator_deferred_ddl)")
+
+    print(f"✓ Deferred objects rebuilt in {time.perf_counter() - started:.1f}s")
+
+
+# Tables split into monthly partitions by --partitioned, with their partition
+# key. The children carry the created_at of their sale, so they prune with it
+# and keep (composite) foreign keys to their partitioned parents.
+PARTITION_KEYS = {
+    'sales': 'created_at',
+    'product_sales': 'sale_created_at',
+    'item_product_sales': 'sale_created_at',
+}
+PARTITION_PARENTS = {
+    'product_sales': ('sale_id', 'sales'),
+    'item_product_sales': ('product_sale_id', 'product_sales'),
+}
+
+
+def month_partition(day):
+    """Suffix of the monthly partition holding day: 2025-01-31 -> '2025_01'"""
+    return day.strftime('%Y_%m')
+
+
+def partition_table(table, partition):
+    """Table to write: the month partition of a partitioned table, else the table itself"""
+    return f"{table}_{partition}" if partition and table in PARTITION_KEYS else table
+
+
+def sales_partitioned(cursor):
+    cursor.execute("""
+        SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('sales'))
+    """)
+    return cursor.fetchone()[0]
+
+
+def partition_sales_tables(conn):
+    """Recreate the (empty) PARTITION_KEYS tables partitioned by month.
+
+    Foreign keys into them survive only where the referencing table has the
+    partition key as well (see add_partition_foreign_keys, run after the
+    load); the others (payments, deliveries...) are dropped.
+    """
+    cursor = conn.cursor()
+    if sales_partitioned(cursor):
+        conn.commit()
+        print("✓ Sales tables already partitioned by month")
+        return
+    for table in PARTITION_KEYS:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+        if cursor.fetchone()[0]:
+            raise RuntimeError(f"--partitioned needs empty sales tables, but {table} has rows")
+
+    cursor.execute("""
+        SELECT c.conrelid::regclass::text, c.conname, c.confrelid::regclass::text,
+               pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        WHERE c.contype = 'f' AND (c.conrelid = ANY(%(tables)s::regclass[])
+                                   OR c.confrelid = ANY(%(tables)s::regclass[]))
+    """, {'tables': list(PARTITION_KEYS)})
+    foreign_keys = cursor.fetchall()
+
+    # Same columns, defaults and checks; keys come back once the old tables are gone
+    sequences = {}
+    for table, key in PARTITION_KEYS.items():
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+        sequences[table] = cursor.fetchone()[0]
+        cursor.execute(f"ALTER SEQUENCE {sequences[table]} OWNED BY NONE")
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        key_column = f", {key} TIMESTAMP NOT NULL" if key != 'created_at' else ''
+        cursor.execute(f"""
+            CREATE TABLE {table} (
+                LIKE {table}_unpartitioned
+                INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS
+                {key_column}
+            ) PARTITION BY RANGE ({key})
+        """)
+    cursor.execute("DROP TABLE " + ", ".join(f"{t}_unpartitioned" for t in PARTITION_KEYS) + " CASCADE")
+
+    for table, key in PARTITION_KEYS.items():
+        cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {key})")
+        cursor.execute(f"ALTER SEQUENCE {sequences[table]} OWNED BY {table}.id")
+    dropped = []
+    for table, name, referenced, definition in foreign_keys:
+        if table not in PARTITION_KEYS:
+            dropped.append(f"{table}.{name}")
+        elif referenced not in PARTITION_KEYS:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    conn.commit()
+
+    print(f"✓ Partitioned {', '.join(PARTITION_KEYS)} by month")
+    if dropped:
+        print(f"  → dropped foreign keys into them from unpartitioned tables: {', '.join(dropped)}")
 
-    # Insert delivery_sales in batch
-    if delivery_sales_data:
-        execute_batch(cursor, """
-            INSERT INTO delivery_sales (
-                sale_id, courier_name, courier_phone, courier_type,
-                delivery_type, status, delivery_fee, courier_fee
-            ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-        """, delivery_sales_data, page_size=1000)
 
-        # Get inserted delivery_sale IDs
+def add_partition_foreign_keys(conn):
+    """Link the partitioned children to their parents once loaded (one validating scan each)"""
+    cursor = conn.cursor()
+    for table, (column, parent) in PARTITION_PARENTS.items():
+        name = f"{table}_{column}_fkey"
         cursor.execute("""
-            SELECT id FROM delivery_sales
-            ORDER BY id DESC
-            LIMIT %s
-        """, (len(delivery_sales_data),))
-        delivery_sale_ids = [row[0] for row in cursor.fetchall()]
-        delivery_sale_ids.reverse()
-
-        # Prepare delivery addresses
-        for delivery_sale_id, mapping in zip(delivery_sale_ids, delivery_sale_mapping):
-            addr = mapping['address']
-            # Ensure coordinates are within valid range for Brazil
-            lat = max(-33.0, min(-5.0, addr['latitude']))
-            long = max(-74.0, min(-34.0, addr['longitude']))
-
-            delivery_addresses_data.append((
-                mapping['sale_id'], delivery_sale_id, addr['street'], addr['number'],
-                addr['complement'], addr['neighborhood'], addr['city'],
-                addr['state'], addr['postal_code'], lat, long
-            ))
-
-        # Insert delivery_addresses in batch
-        if delivery_addresses_data:
-            execute_batch(cursor, """
-                INSERT INTO delivery_addresses (
-                    sale_id, delivery_sale_id, street, number, complement,
-                    neighborhood, city, state, postal_code, latitude, longitude
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """, delivery_addresses_data, page_size=1000)
-
-    # Prepare batch data for payments
-    payments_data = []
-    for sale_id, sale in zip(sale_ids, sales_batch):
-        for payment in sale['payments']:
-            payment_type_id = payment_types_cache.get(payment['type'])
-            if payment_type_id:
-                payments_data.append((
-                    sale_id, payment_type_id, Decimal(str(payment['value']))
-                ))
-
-    # Insert payments in batch
-    if payments_data:
-        execute_batch(cursor, """
-            INSERT INTO payments (sale_id, payment_type_id, value)
-            VALUES (%s,%s,%s)
-        """, payments_data, page_size=1000)
+            SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s)
+        """, (table, name))
+        if cursor.fetchone()[0]:
+            continue
+        started = time.perf_counter()
+        cursor.execute(f"""
+            ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}, sale_created_at)
+            REFERENCES {parent} (id, {PARTITION_KEYS[parent]}) ON DELETE CASCADE
+        """)
+        conn.commit()
+        print(f"  → foreign_key {name} on {table}: {time.perf_counter() - started:.1f}s")
+
+
+def create_month_partitions(conn, days):
+    """Create the monthly partitions covering days (existing ones are kept)"""
+    cursor = conn.cursor()
+    months = sorted({(day.year, day.month) for day in days})
+    for year, month in months:
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        for table in PARTITION_KEYS:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {partition_table(table, month_partition(start))}
+                PARTITION OF {table} FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')
+            """)
+    conn.commit()
+    return len(months)
+
 
+def interleave_months(tasks):
+    """Order day tasks round-robin across months, so concurrent workers load different partitions"""
+    months = {}
+    for task in tasks:
+        months.setdefault(month_partition(task[0]), []).append(task)
+    return [task for group in itertools.zip_longest(*months.values()) for task in group if task]
+
+
+def table_partitions(cursor, table):
+    cursor.execute("""
+        SELECT inhrelid::regclass::text FROM pg_inherits
+        WHERE inhparent = to_regclass(%s) ORDER BY 1
+    """, (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def indexed_partitions(cursor, index):
+    """Partitions whose index is already attached to the partitioned index"""
+    cursor.execute("""
+        SELECT i.indrelid::regclass::text FROM pg_inherits h
+        JOIN pg_index i ON i.indexrelid = h.inhrelid
+        WHERE h.inhparent = to_regclass(%s)
+    """, (index,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+# Indexes for the dashboard queries: (name, table, definition after "ON table").
+# sales is loaded in created_at order, so a small BRIN index covers date ranges;
+# the partial indexes only hold COMPLETED sales and include the aggregated
+# columns, so revenue by hour, store and channel can be answered from them.
+ANALYTICS_INDEXES = [
+    ('idx_sales_created_at_brin', 'sales', 'USING brin (created_at) WITH (pages_per_range = 32)'),
+    ('idx_sales_completed_created_at', 'sales',
+     "(created_at) INCLUDE (id, store_id, channel_id, total_amount) WHERE sale_status_desc = 'COMPLETED'"),
+    ('idx_sales_completed_store_date', 'sales',
+     "(store_id, created_at) INCLUDE (channel_id, total_amount) WHERE sale_status_desc = 'COMPLETED'"),
+    ('idx_sales_completed_channel_date', 'sales',
+     "(channel_id, created_at) INCLUDE (store_id, total_amount) WHERE sale_status_desc = 'COMPLETED'"),
+    ('idx_product_sales_product_covering', 'product_sales',
+     '(product_id, sale_id) INCLUDE (quantity, total_price)'),
+    ('idx_product_sales_sale', 'product_sales', '(sale_id) INCLUDE (product_id, quantity, total_price)'),
+]
 
-def create_indexes(conn):
-    """Create performance indexes"""
+# Indexes of earlier versions, superseded by ANALYTICS_INDEXES and dropped
+# from databases loaded before them
+OBSOLETE_INDEXES = ['idx_sales_date_status', 'idx_product_sales_product_sale']
+
+# Tables vacuumed and analyzed after the indexes: fresh statistics for the
+# planner, and a visibility map so covering indexes give index-only scans
+ANALYZE_TABLES = ['sales', 'product_sales', 'item_product_sales', 'delivery_sales', 'payments']
+
+
+def build_index(db_url, index, table, definition, partition=None):
+    """Build index on table (or on one partition, attached to the parent index), returning its build time"""
+    conn = get_db_connection(db_url)
+    try:
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        if partition:
+            partition_index = index + partition[len(table):]
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {partition_index} ON {partition} {definition}")
+            cursor.execute(f"ALTER INDEX {index} ATTACH PARTITION {partition_index}")
+        else:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} {definition}")
+        conn.commit()
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def index_size(cursor, index):
+    """Size of an index, summed over its partitions"""
+    cursor.execute("""
+        SELECT pg_size_pretty(COALESCE(
+            (SELECT sum(pg_relation_size(relid)) FROM pg_partition_tree(%s::regclass))::bigint,
+            pg_relation_size(%s::regclass)
+        ))
+    """, (index, index))
+    return cursor.fetchone()[0]
+
+
+def analyze_table(db_url, table):
+    """VACUUM (ANALYZE) one table, returning its time"""
+    conn = get_db_connection(db_url)
+    try:
+        conn.autocommit = True
+        started = time.perf_counter()
+        conn.cursor().execute(f"VACUUM (ANALYZE) {table}")
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def create_indexes(conn, db_url=None, jobs=1):
+    """Build ANALYTICS_INDEXES with `jobs` connections, then vacuum and analyze the sales tables.
+
+    On partitioned tables every partition's index is built separately and
+    attached to the parent index. Each index is reported with its build
+    time (summed over partitions) and size; existing ones are kept and
+    OBSOLETE_INDEXES are dropped.
+    """
     print("Creating indexes...")
     cursor = conn.cursor()
-    
-    # Additional indexes
-    indexes = [
-        "CREATE INDEX IF NOT EXISTS idx_sales_date_status ON sales(DATE(created_at), sale_status_desc)",
-        "CREATE INDEX IF NOT EXISTS idx_product_sales_product_sale ON product_sales(product_id, sale_id)",
-    ]
-    
-    for idx in indexes:
-        try:
-            cursor.execute(idx)
-        except:
-            pass
-    
-    
+    started = time.perf_counter()
+
+    for name in OBSOLETE_INDEXES:
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        if cursor.fetchone()[0]:
+            # On a partitioned table this drops the partitions' indexes too
+            cursor.execute(f"DROP INDEX {name}")
+            print(f"  → {name}: dropped (superseded)")
+
+    builds = {}
+    for name, table, definition in ANALYTICS_INDEXES:
+        partitions = table_partitions(cursor, table)
+        if partitions:
+            # The parent index stays invalid until every partition's index is attached
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}")
+            # Partitions created after the index is complete (--append) get theirs automatically
+            indexed = indexed_partitions(cursor, name)
+            builds[name] = [(name, table, definition, partition)
+                            for partition in partitions if partition not in indexed]
+        else:
+            cursor.execute("SELECT to_regclass(%s)", (name,))
+            builds[name] = [] if cursor.fetchone()[0] else [(name, table, definition, None)]
     conn.commit()
-    print("✓ Indexes created")
+
+    # Indexes of the same table build concurrently (CREATE INDEX only blocks writes)
+    with ThreadPoolExecutor(jobs) as executor:
+        timings = {name: [executor.submit(build_index, db_url, *build) for build in tasks]
+                   for name, tasks in builds.items()}
+        for name, futures in timings.items():
+            elapsed = sum(future.result() for future in futures)
+            size = index_size(cursor, name)
+            conn.commit()
+            if not futures:
+                print(f"  → {name}: already exists ({size})")
+                continue
+            parts = f", {len(futures)} partitions" if len(futures) > 1 else ""
+            print(f"  → {name}: {elapsed:.1f}s, {size}{parts}")
+    print(f"✓ Indexes created in {time.perf_counter() - started:.1f}s ({jobs} connections)")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(jobs) as executor:
+        elapsed = executor.map(lambda table: analyze_table(db_url, table), ANALYZE_TABLES)
+        for table, seconds in zip(ANALYZE_TABLES, elapsed):
+            print(f"  → VACUUM (ANALYZE) {table}: {seconds:.1f}s")
+    print(f"✓ Tables analyzed in {time.perf_counter() - started:.1f}s")
+
+
+# Sales and customers synthesized (and loaded into temporary tables) to calibrate --plan
+PLAN_SAMPLE_SALES = 5000
+PLAN_SAMPLE_CUSTOMERS = 2000
+# Tables whose rows scale with the sales
+PLAN_SALES_TABLES = [
+    'sales', 'product_sales', 'item_product_sales', 'delivery_sales', 'delivery_addresses', 'payments'
+]
+
+
+def format_bytes(size):
+    for unit in ['B', 'kB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def create_plan_tables(conn):
+    """Empty temporary copies of the schema's tables for this connection.
+
+    They shadow the real tables (pg_temp comes first in the search path),
+    with the same columns, defaults, keys and foreign keys, and ids from
+    sequences of their own, so every loader runs its real path without
+    touching the database. Dashboard indexes are left out, as on a fresh
+    load. On a partitioned schema the copies are plain tables:
+    sale_created_at stays empty and the composite foreign keys, added
+    after the load, are left out too.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.relname, array(
+            SELECT a.attname::text FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        )
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+          AND c.relname NOT LIKE 'generator%' AND c.relname NOT LIKE 'rollup%'
+    """)
+    tables = cursor.fetchall()
+    # Definitions read before the copies exist, so their table names stay unqualified
+    cursor.execute("""
+        SELECT c.relname, pg_get_constraintdef(k.oid), r.relname FROM pg_constraint k
+        JOIN pg_class c ON c.oid = k.conrelid JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_class r ON r.oid = k.confrelid
+        WHERE n.nspname = 'public' AND k.contype IN ('p', 'u', 'f') AND k.conparentid = 0
+          AND NOT c.relispartition
+        ORDER BY k.contype = 'f'
+    """)
+    constraints = cursor.fetchall()
+    names = {table for table, _ in tables}
+    for table, columns in tables:
+        cursor.execute(f"CREATE TEMP TABLE {table} (LIKE public.{table} INCLUDING DEFAULTS)")
+        if 'id' in columns:
+            cursor.execute(f"CREATE TEMP SEQUENCE {table}_id_seq OWNED BY pg_temp.{table}.id")
+            cursor.execute(f"ALTER TABLE pg_temp.{table} ALTER COLUMN id "
+                           f"SET DEFAULT nextval('pg_temp.{table}_id_seq')")
+        if 'sale_created_at' in columns:
+            cursor.execute(f"ALTER TABLE pg_temp.{table} ALTER COLUMN sale_created_at DROP NOT NULL")
+    for table, definition, referenced in constraints:
+        if table not in names or (referenced and referenced not in names):
+            continue
+        if 'sale_created_at' in definition:
+            # Partitioned schema: composite foreign keys come after the load, keys stay on id
+            if not definition.startswith('PRIMARY KEY'):
+                continue
+            definition = definition.replace(', sale_created_at', '')
+        cursor.execute(f"ALTER TABLE pg_temp.{table} ADD {definition}")
+    conn.commit()
+
+
+def count_rows(cursor, table):
+    cursor.execute(f"SELECT count(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def commit_latency(conn, samples=5):
+    """Median seconds of a commit that flushes the WAL (the temporary tables write none)"""
+    cursor = conn.cursor()
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        cursor.execute("SELECT txid_current()")
+        conn.commit()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def plan_run(conn, args):
+    """Estimate rows, disk and runtime of a run with these settings, writing nothing.
+
+    Sales per day are the generator's own (calendar, WEEKDAY_MULT and daily
+    gauss for this seed), so the sales count is exact. Child rows per sale,
+    bytes per row and the rates of every engine and loader come from a
+    sample of PLAN_SAMPLE_SALES sales, written with the same catalog into
+    temporary copies of the tables (create_plan_tables).
+    """
+    calendar = plan_sales_days(args.months, derive_seed(args.seed, 'calendar'), args.end_date)
+    sales_seed = derive_seed(args.seed, 'sales')
+    day_shards = [(day, plan_day_shards(derive_seed(sales_seed, day.date()), mult)) for day, mult in calendar]
+    total_sales = sum(count for _, shards in day_shards for _, count, _ in shards)
+    total_shards = sum(len(shards) for _, shards in day_shards)
+    print(f"Planning {args.months} months ({calendar[0][0]:%Y-%m-%d} to {calendar[-1][0]:%Y-%m-%d}), "
+          f"seed {args.seed}...")
+
+    # The catalog the run would create, in the temporary tables
+    create_plan_tables(conn)
+    output = DatabaseOutput(conn, 'copy')
+    catalog = create_catalog(output, args)
+    payment_types = catalog['payment_types']
+    started = time.perf_counter()
+    catalog['customers'], _ = generate_customers(
+        output, PLAN_SAMPLE_CUSTOMERS, derive_seed(args.seed, 'customers'), end_date=args.end_date
+    )
+    customer_seconds = (time.perf_counter() - started) / PLAN_SAMPLE_CUSTOMERS
+    pools = None
+    if args.pool_size > 0:
+        pools = build_faker_pools(args.pool_size, derive_seed(args.seed, 'faker_pools'), args.pool_cache)
+    set_faker_pools(pools)
+
+    # The first shard of days spread over the calendar, so weekdays and anomalies are mixed in
+    shards_needed = -(-PLAN_SAMPLE_SALES // SALES_SHARD_SIZE)
+    step = max(1, len(day_shards) // shards_needed)
+    sample_shards = [(day, shards[0]) for day, shards in day_shards[::step] if shards][:shards_needed]
+    sample_sales = sum(count for _, (_, count, _) in sample_shards)
+
+    generation = {}
+    sample = None
+    for engine, build_shard in SALES_ENGINES.items():
+        state = {
+            'catalog': catalog, 'samplers': build_samplers(catalog),
+            'arrays': build_catalog_arrays(catalog) if engine == 'numpy' else None,
+        }
+        started = time.perf_counter()
+        batches = [build_shard(state, day, count, seed) for day, (_, count, seed) in sample_shards]
+        generation[engine] = (time.perf_counter() - started) / sample_sales
+        if engine == args.engine:
+            sample = batches
+
+    # Every loader writes the same sample through write_shard, one commit per shard
+    cursor = conn.cursor()
+    loading = {}
+    for name in LOADERS:
+        cursor.execute(f"TRUNCATE {', '.join(f'pg_temp.{table}' for table in PLAN_SALES_TABLES)} CASCADE")
+        conn.commit()
+        loader_output = DatabaseOutput(conn, name)
+        started = time.perf_counter()
+        for batch, (day, (shard, count, _)) in zip(sample, sample_shards):
+            write_shard(loader_output, batch, payment_types, None, day, shard, count, RunMetrics())
+        loading[name] = (time.perf_counter() - started) / sample_sales
+    commit_seconds = commit_latency(conn)
+
+    # Every --output-dir format writes the same sample (one part per shard, as one per day)
+    # and the customers into a scratch directory: seconds and bytes per sale and per customer
+    file_formats = {}
+    for file_format in FILE_FORMATS:
+        with tempfile.TemporaryDirectory() as scratch:
+            file_output = FileOutput(scratch, file_format)
+            try:
+                started = time.perf_counter()
+                for batch, (day, (shard, count, _)) in zip(sample, sample_shards):
+                    file_output.start_part(f"{day:%Y-%m-%d}_{shard:03d}")
+                    write_shard(file_output, batch, payment_types, None, day, shard, count, RunMetrics())
+                    file_output.end_part()
+                sales_seconds = (time.perf_counter() - started) / sample_sales
+                started = time.perf_counter()
+                write_customer_chunk(file_output, (0, 1, PLAN_SAMPLE_CUSTOMERS, derive_seed(args.seed, 'customers'),
+                                                   args.end_date))
+                customers_seconds = (time.perf_counter() - started) / PLAN_SAMPLE_CUSTOMERS
+            except RuntimeError as error:
+                # Parquet without pyarrow
+                file_formats[file_format] = str(error)
+                continue
+            sizes = {
+                table: sum(entry.stat().st_size for entry in os.scandir(os.path.join(scratch, table)))
+                for table in os.listdir(scratch)
+            }
+        customer_bytes = sizes.pop('customers')
+        file_formats[file_format] = (sales_seconds, sum(sizes.values()) / sample_sales,
+                                     customers_seconds, customer_bytes / PLAN_SAMPLE_CUSTOMERS)
+
+    def table_bytes(table):
+        cursor.execute("SELECT pg_total_relation_size(%s::regclass)", (table,))
+        return cursor.fetchone()[0]
+
+    sampled = {table: count_rows(cursor, table) for table in PLAN_SALES_TABLES + ['customers']}
+    size_per_row = {table: table_bytes(table) / max(sampled[table], 1) for table in sampled}
+    # Dashboard indexes (BRIN stays a few pages at any size, so it is left out)
+    index_size_per_row, index_seconds_per_row = {}, {}
+    for name, table, definition in ANALYTICS_INDEXES:
+        if 'USING brin' in definition:
+            continue
+        before = table_bytes(table)
+        started = time.perf_counter()
+        cursor.execute(f"CREATE INDEX ON pg_temp.{table} {definition}")
+        index_seconds_per_row[table] = (index_seconds_per_row.get(table, 0)
+                                        + (time.perf_counter() - started) / sampled[table])
+        index_size_per_row[table] = index_size_per_row.get(table, 0) + (table_bytes(table) - before) / sampled[table]
+    conn.commit()
+
+    rows = {table: total_sales * sampled[table] / sample_sales for table in PLAN_SALES_TABLES}
+    rows['customers'] = args.customers
+    print()
+    print(f"Rows and disk (bytes per row measured on a sample of {sample_sales:,} sales):")
+    disk = 0
+    for table in PLAN_SALES_TABLES + ['customers']:
+        table_disk = rows[table] * size_per_row[table]
+        disk += table_disk
+        approx = ' ' if table in ('sales', 'customers') else '~'
+        print(f"  {table:<20} {approx}{rows[table]:>14,.0f} rows {format_bytes(table_disk):>10}")
+    index_disk = sum(rows[table] * size for table, size in index_size_per_row.items())
+    print(f"  {'dashboard indexes':<20} {'':>20} {format_bytes(index_disk):>10}")
+    print(f"  {'total':<20} {'':>20} {format_bytes(disk + index_disk):>10}")
+
+    print()
+    print("Throughput (one process, one connection):")
+    for engine, seconds in generation.items():
+        print(f"  → generation {engine}: {1 / seconds:,.0f} sales/s")
+    print(f"  → customers: {1 / customer_seconds:,.0f}/s")
+    print(f"  → commit: {commit_seconds * 1000:.1f}ms")
+    for name, seconds in loading.items():
+        print(f"  → loader {name}: {1 / seconds:,.0f} sales/s")
+
+    # Temporary tables skip the WAL, so every shard's commit is added at the measured latency
+    workers = args.workers
+    fixed = args.customers * customer_seconds / workers + sum(
+        rows[table] * seconds for table, seconds in index_seconds_per_row.items()
+    ) / min(args.index_jobs, len(index_seconds_per_row))
+    print()
+    print(f"Projected runtime ({args.engine} engine, {workers} worker(s), {args.index_jobs} index job(s)):")
+    for name, seconds in loading.items():
+        write = total_sales * seconds + total_shards * commit_seconds
+        synthesis = total_sales * generation[args.engine]
+        inline = fixed + (synthesis + write) / workers
+        pipelined = fixed + max(synthesis, write) / workers
+        print(f"  → {name}: {format_duration(inline)} writing inline, "
+              f"{format_duration(pipelined)} with enough --writers")
+    print("  (assumes the database keeps up with every worker as it did with one connection; "
+          "VACUUM not included)")
+    print("  --async-writers is not projected: its asyncpg connections cannot see the temporary "
+          "tables (the --writers figure is the closest estimate)")
+
+    print()
+    print(f"Projected --output-dir files ({args.engine} engine, {workers} worker(s), gzip/zstd on disk):")
+    synthesis = total_sales * generation[args.engine]
+    for file_format, measured in file_formats.items():
+        if isinstance(measured, str):
+            print(f"  → {file_format}: not measured ({measured})")
+            continue
+        sales_seconds, sale_bytes, customers_seconds, customer_bytes = measured
+        files_disk = total_sales * sale_bytes + args.customers * customer_bytes
+        runtime = (args.customers * customers_seconds + synthesis + total_sales * sales_seconds) / workers
+        print(f"  → {file_format}: {format_bytes(files_disk)}, {format_duration(runtime)} "
+              f"({1 / sales_seconds:,.0f} sales/s written)")
+    return rows
 
 
 def main():
@@ -756,6 +2773,16 @@ def main():
     default_items = int(os.getenv('ITEMS', 200))
     default_customers = int(os.getenv('CUSTOMERS', 10000))
     default_months = int(os.getenv('MONTHS', 6))
+    default_loader = os.getenv('LOADER', 'copy')
+    default_workers = int(os.getenv('WORKERS', 1))
+    default_engine = os.getenv('ENGINE', 'numpy')
+    default_pool_size = int(os.getenv('FAKER_POOL_SIZE', 10000))
+    default_seed = int(os.getenv('SEED')) if os.getenv('SEED') else None
+    default_output_format = os.getenv('OUTPUT_FORMAT', 'copy')
+    default_writers = int(os.getenv('WRITERS', 0))
+    default_async_writers = int(os.getenv('ASYNC_WRITERS', 0))
+    default_metrics_log = os.getenv('METRICS_LOG')
+    default_metrics_file = os.getenv('METRICS_FILE')
 
     parser = argparse.ArgumentParser(
         description='Generate God Level Challenge data',
@@ -768,6 +2795,16 @@ Environment Variables:
   ITEMS         Number of items/complements (default: 200)
   CUSTOMERS     Number of customers (default: 10000)
   MONTHS        Months of sales data (default: 6)
+  LOADER        Sales loader: copy or batch (default: copy)
+  WORKERS       Sales worker processes (default: 1)
+  WRITERS       Writer threads per worker, 0 = write inline (default: 0)
+  ASYNC_WRITERS asyncpg connections per worker writing shards concurrently (default: 0)
+  ENGINE        Sale synthesis engine: numpy or python (default: numpy)
+  FAKER_POOL_SIZE  Values per pooled Faker field, 0 = unique values (default: 10000)
+  SEED          Run seed for reproducible data (default: random)
+  OUTPUT_FORMAT File format for --output-dir: copy, binary or parquet (default: copy)
+  METRICS_LOG   JSON-lines metrics log (default: none)
+  METRICS_FILE  Prometheus text-format metrics file (default: none)
 
 Create a .env file to avoid passing arguments every time.
 See .env.example for template.
@@ -780,31 +2817,264 @@ See .env.example for template.
     parser.add_argument('--items', type=int, default=default_items, help=f'Number of items/complements (default: {default_items})')
     parser.add_argument('--customers', type=int, default=default_customers, help=f'Number of customers (default: {default_customers})')
     parser.add_argument('--months', type=int, default=default_months, help=f'Months of sales data (default: {default_months})')
+    parser.add_argument('--loader', choices=sorted(LOADERS), default=default_loader,
+                       help=f'Sales loader: COPY FROM STDIN or execute_batch INSERTs (default: {default_loader})')
+    parser.add_argument('--workers', type=int, default=default_workers,
+                       help=f'Worker processes generating sales days in parallel (default: {default_workers})')
+    parser.add_argument('--writers', type=int, default=default_writers,
+                       help=f'Writer threads per worker, each with its own connection, writing shards '
+                            f'from a bounded queue while the next ones are generated; '
+                            f'0 writes inline (default: {default_writers})')
+    parser.add_argument('--async-writers', type=int, default=default_async_writers,
+                       help=f'asyncpg connections per worker writing shards concurrently with binary COPY, '
+                            f'one transaction per shard; replaces --writers and --loader for sales '
+                            f'(default: {default_async_writers})')
+    parser.add_argument('--engine', choices=sorted(SALES_ENGINES), default=default_engine,
+                       help=f'Sale synthesis engine: vectorized per day or one sale at a time (default: {default_engine})')
+    parser.add_argument('--pool-size', type=int, default=default_pool_size,
+                       help=f'Values per pooled Faker field for sale text; larger = more unique, '
+                            f'0 calls Faker for every value (default: {default_pool_size})')
+    parser.add_argument('--pool-cache', metavar='DIR',
+                       help='Directory to cache Faker pools between runs')
+    parser.add_argument('--seed', type=int, default=default_seed,
+                       help='Run seed; every entity, day and shard seed derives from it (default: random)')
+    parser.add_argument('--end-date', type=datetime.fromisoformat, metavar='YYYY-MM-DD',
+                       help='Last day of sales, to reproduce a run made on another day (default: today)')
+    parser.add_argument('--resume', nargs='?', type=int, const=0, metavar='RUN_ID',
+                       help='Resume an interrupted run (default: the latest unfinished one), '
+                            'reusing its catalog and skipping committed shards')
+    parser.add_argument('--append', action='store_true',
+                       help='Extend an existing dataset: reuse its stores, products and customers '
+                            'and generate only the days after the latest sale, up to --end-date')
+    parser.add_argument('--check-loaders', action='store_true',
+                       help='Load a sample through every loader into temporary tables, '
+                            'compare rows and sales/s, then exit')
+    parser.add_argument('--bulk-load', action='store_true',
+                       help='Drop the keys, indexes and foreign keys of the sales and customer tables '
+                            'while loading, then rebuild them in parallel')
+    parser.add_argument('--unlogged', action='store_true',
+                       help='With --bulk-load, load into UNLOGGED tables and set them LOGGED afterwards')
+    parser.add_argument('--index-jobs', type=int, default=4,
+                       help='Connections rebuilding deferred indexes and constraints, '
+                            'and building per-partition indexes, in parallel (default: 4)')
+    parser.add_argument('--partitioned', action='store_true',
+                       help='Partition sales, product_sales and item_product_sales by month '
+                            '(tables must be empty) and load every month straight into its partition')
+    parser.add_argument('--output-dir', metavar='DIR',
+                       help='Write every table to chunked, compressed files in DIR (with a manifest) '
+                            'instead of a database')
+    parser.add_argument('--output-format', choices=sorted(FILE_FORMATS), default=default_output_format,
+                       help=f'File format for --output-dir: COPY text, COPY binary or Parquet '
+                            f'(default: {default_output_format})')
+    parser.add_argument('--metrics-log', metavar='FILE', default=default_metrics_log,
+                       help='Append per-phase timings, rows per table, shard latency histograms and RSS '
+                            'to FILE as JSON lines while generating sales')
+    parser.add_argument('--metrics-file', metavar='FILE', default=default_metrics_file,
+                       help='Keep the same metrics in FILE in Prometheus text format '
+                            '(for the node_exporter textfile collector)')
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                       help='Seconds between metrics updates (default: 10)')
+    parser.add_argument('--rollups', action='store_true',
+                       help='Sum every generated shard into daily rollups (store x channel, product, '
+                            'hour of day) and load them into the rollup_* tables with the sales')
+    parser.add_argument('--refresh-rollups', action='store_true',
+                       help='Rebuild the rollup_* tables from the sales in the database, then exit')
+    parser.add_argument('--plan', action='store_true',
+                       help='Estimate rows per table, disk and runtime of this run (database loaders '
+                            'and --output-dir formats) from a short calibration sample, written only to '
+                            'temporary tables and files, then exit')
+    parser.add_argument('--load-dir', metavar='DIR',
+                       help='Load a directory written by --output-dir into the database with '
+                            '--workers parallel COPY connections, then exit')
 
     args = parser.parse_args()
-    
-    print("=" * 70)
-    print("God Level Coder Challenge - Data Generator")
-    print("=" * 70)
-    print(f"Generating {args.months} months of restaurant operational data...")
-    print()
-    
-    conn = get_db_connection(args.db_url)
+
+    if args.load_dir:
+        load_output_dir(args.db_url, args.load_dir, args.workers)
+        return
+    if args.plan:
+        if args.resume is not None or args.append:
+            parser.error("--plan cannot be combined with --resume or --append")
+        if args.seed is None:
+            args.seed = random.SystemRandom().getrandbits(32)
+        args.end_date = (args.end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        conn = get_db_connection(args.db_url)
+        try:
+            plan_run(conn, args)
+        finally:
+            conn.close()
+        return
+    if args.refresh_rollups:
+        conn = get_db_connection(args.db_url)
+        try:
+            days = refresh_rollups(conn)
+        finally:
+            conn.close()
+        print(f"✓ Rollups rebuilt from the sales of {days:,} day(s)")
+        return
+    if args.output_dir and (args.resume is not None or args.check_loaders or args.writers or args.bulk_load):
+        parser.error("--output-dir cannot be combined with --resume, --check-loaders, --writers or --bulk-load")
+    if args.rollups and args.output_dir:
+        parser.error("--rollups cannot be combined with --output-dir (run --refresh-rollups after --load-dir)")
+    if args.async_writers and (args.writers or args.output_dir):
+        parser.error("--async-writers cannot be combined with --writers or --output-dir")
+    if args.unlogged and not args.bulk_load:
+        parser.error("--unlogged needs --bulk-load")
+    if args.bulk_load and args.check_loaders:
+        parser.error("--bulk-load cannot be combined with --check-loaders")
+    if args.partitioned and (args.output_dir or args.bulk_load):
+        parser.error("--partitioned cannot be combined with --output-dir or --bulk-load")
+    if args.append and (args.resume is not None or args.output_dir or args.bulk_load
+                        or args.partitioned or args.check_loaders):
+        parser.error("--append cannot be combined with --resume, --output-dir, --bulk-load, "
+                     "--partitioned or --check-loaders")
+    if args.check_loaders:
+        # Before any catalog exists: the check builds its own in temporary tables
+        if args.seed is None:
+            args.seed = random.SystemRandom().getrandbits(32)
+        args.end_date = (args.end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        conn = get_db_connection(args.db_url)
+        try:
+            check_loader_parity(conn, args)
+        finally:
+            conn.close()
+        return
+
+    if args.output_dir:
+        # No database: keys come from local counters, rows go to files
+        conn = None
+        output = FileOutput(args.output_dir, args.output_format)
+    else:
+        conn = get_db_connection(args.db_url)
+        if args.resume is None and not args.append:
+            conflict = new_run_conflict(conn)
+            if conflict:
+                conn.close()
+                parser.error(f"cannot start a new run: {conflict}")
+        output = DatabaseOutput(conn, args.loader)
     
     try:
-        sub_brand_ids, channels = setup_base_data(conn)
-        stores = generate_stores(conn, sub_brand_ids, args.stores)
-        products, items, option_groups = generate_products_and_items(
-            conn, sub_brand_ids, args.products, args.items
-        )
-        customers = generate_customers(conn, args.customers)
+        if args.resume is not None:
+            # Reuse the interrupted run's settings and catalog instead of creating new ones
+            run_id, settings, catalog = load_run(conn, args.resume)
+            # Runs recorded by earlier versions lack the newer settings: those keep their flags
+            for key in RUN_SETTINGS:
+                if key in settings:
+                    setattr(args, key, settings[key])
+            args.end_date = datetime.fromisoformat(args.end_date)
+            args.start_date = args.start_date and datetime.fromisoformat(args.start_date)
+        else:
+            if args.seed is None:
+                args.seed = random.SystemRandom().getrandbits(32)
+            args.end_date = (args.end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+            args.start_date = next_sales_day(conn) if args.append else None
+        settings = {key: getattr(args, key) for key in RUN_SETTINGS}
+        settings['end_date'] = args.end_date.date().isoformat()
+        settings['start_date'] = args.start_date and args.start_date.date().isoformat()
+
+        print("=" * 70)
+        print("God Level Coder Challenge - Data Generator")
+        print("=" * 70)
+        if args.start_date:
+            print(f"Appending restaurant operational data from {args.start_date:%Y-%m-%d} "
+                  f"to {args.end_date:%Y-%m-%d}...")
+        else:
+            print(f"Generating {args.months} months of restaurant operational data...")
+        print(f"Seed: {args.seed} (rerun with --seed {args.seed} to reproduce)")
+        print()
+
+        if args.start_date and args.start_date > args.end_date:
+            print(f"✓ Sales already up to date (latest sale on {args.start_date - timedelta(days=1):%Y-%m-%d})")
+            return
+
+        if args.bulk_load:
+            defer_constraints(conn, args.unlogged)
+        if args.partitioned:
+            partition_sales_tables(conn)
+            calendar = plan_sales_days(args.months, derive_seed(args.seed, 'calendar'), args.end_date)
+            months = create_month_partitions(conn, [day for day, _ in calendar])
+            print(f"✓ {months} monthly partitions per table ready")
+            output.partitioned = True
+        elif args.append and output.partitioned:
+            calendar = plan_sales_days(args.months, derive_seed(args.seed, 'calendar'),
+                                       args.end_date, args.start_date)
+            months = create_month_partitions(conn, [day for day, _ in calendar])
+            print(f"✓ {months} monthly partition(s) per table ready")
+
+        # The run is recorded before any catalog row, so every phase after it can be resumed
+        if args.resume is not None:
+            print(f"✓ Resuming run {run_id}")
+        elif args.append:
+            seed_entity(args.seed, 'catalog')
+            catalog = discover_catalog(conn)
+            run_id = start_run(conn, settings, catalog)
+        else:
+            catalog = {}
+            run_id = None if args.output_dir else start_run(conn, settings)
+
+        catalog_files = []
+        if 'stores' not in catalog:
+            # One transaction with its checkpoint: after a crash the whole catalog is written again
+            if args.resume is not None:
+                reset_catalog_sequences(conn)
+            output.start_part('catalog')
+            catalog.update(create_catalog(output, args))
+            if run_id:
+                record_run_catalog(output.cursor, run_id, catalog)
+            output.commit()
+            catalog_files = output.end_part()
+        elif args.resume is not None:
+            print(f"✓ Reusing {len(catalog['stores'])} stores, {len(catalog['products'])} products")
+        if not args.start_date and isinstance(catalog.get('customers', range(0)), range):
+            # Appends reuse the customers in the database; a resumed run finishes its own chunks
+            catalog['customers'], customer_files = generate_customers(
+                output, args.customers, derive_seed(args.seed, 'customers'), args.workers, args.db_url,
+                args.end_date, run_id, catalog.get('customers')
+            )
+            catalog_files += customer_files
+
+        pools = None
+        if args.pool_size > 0:
+            pools = build_faker_pools(args.pool_size, derive_seed(args.seed, 'faker_pools'), args.pool_cache)
+        set_faker_pools(pools)
+
+        # Days an earlier attempt already wrote shards of: their rollups come from the raw rows
+        resumed_days = set(completed_shards(conn, run_id)) if args.resume is not None else set()
+        rollups = SalesRollups() if args.rollups else None
         
-        total_sales = generate_sales(
-            conn, stores, channels, products, items, 
-            option_groups, customers, args.months
+        total_sales, sales_files = generate_sales(
+            output, catalog, args.months, args.loader,
+            args.workers, args.db_url, args.engine, pools,
+            args.seed, args.end_date, run_id, args.writers,
+            args.metrics_log, args.metrics_file, args.metrics_interval, args.start_date,
+            args.async_writers, rollups
         )
+
+        if args.output_dir:
+            manifest = write_manifest(args.output_dir, args.output_format, catalog_files + sales_files,
+                                      output.ids.last_ids(), settings)
+            tables = manifest['tables']
+            print()
+            print("=" * 70)
+            print(f"✓ Data written to {args.output_dir} (load with --load-dir {args.output_dir})")
+            for table, info in tables.items():
+                print(f"  {table}: {info['rows']:,} rows in {len(info['files'])} file(s)")
+            print("=" * 70)
+            return
+
+        # Rebuild before finishing, so a failed rebuild can be retried with --resume
+        restore_deferred(conn, args.db_url, args.index_jobs)
+        if output.partitioned:
+            add_partition_foreign_keys(conn)
+        if rollups is not None:
+            days, rows = write_rollups(conn, rollups, copy_write_rows, skip_days=resumed_days)
+            if resumed_days:
+                days += refresh_rollups(conn, resumed_days)
+            print(f"✓ Rollups of {days:,} day(s) loaded: "
+                  + ", ".join(f"{table} {count:,} rows" for table, count in rows.items()))
+        finish_run(conn, run_id)
         
-        create_indexes(conn)
+        create_indexes(conn, args.db_url, args.index_jobs)
         
         # Final stats
         cursor = conn.cursor()
@@ -820,10 +3090,10 @@ See .env.example for template.
         print()
         print("=" * 70)
         print("✓ Data generation complete!")
-        print(f"  Stores: {len(stores):,}")
-        print(f"  Products: {len(products):,}")
-        print(f"  Items/Complements: {len(items):,}")
-        print(f"  Customers: {len(customers):,}")
+        print(f"  Stores: {len(catalog['stores']):,}")
+        print(f"  Products: {len(catalog['products']):,}")
+        print(f"  Items/Complements: {len(catalog['items']):,}")
+        print(f"  Customers: {len(catalog['customers']):,}")
         print(f"  Sales: {sales_count:,}")
         print(f"  Product Sales: {product_sales_count:,}")
         print(f"  Item Customizations: {item_sales_count:,}")
@@ -832,10 +3102,11 @@ See .env.example for template.
         
     except Exception as e:
         print(f"Error: {e}")
-        conn.rollback()
+        output.rollback()
         raise
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Instrumentation for generation runs.
+
+Every sales worker (and its writer threads) records phase times, rows per
+table and shard latencies into a RunMetrics. Each finished day carries what
+the worker drained since the previous one back to the main process, where a
+MetricsExporter keeps the run totals and writes them as a JSON-lines log and
+a Prometheus text-format file (for node_exporter's textfile collector).
+"""
+
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Upper bounds (seconds) of the shard latency histogram buckets
+SHARD_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss_bytes():
+    """Resident set size of this process now (peak RSS where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RunMetrics:
+    """Thread-safe phase timers, row counters and shard latency histograms.
+
+    phases is {phase: {table: [seconds, calls]}} (table '' when the phase is
+    not per table); histograms is {stage: {'buckets', 'sum', 'count'}} with
+    one non-cumulative count per SHARD_BUCKETS bound plus one for +Inf.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.rows = {}
+        self.histograms = {}
+
+    def add_time(self, phase, table, seconds, calls=1):
+        with self.lock:
+            entry = self.phases.setdefault(phase, {}).setdefault(table, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+
+    def add_rows(self, table, count):
+        with self.lock:
+            self.rows[table] = self.rows.get(table, 0) + count
+
+    def observe(self, stage, seconds):
+        """Record one shard latency for stage"""
+        index = next((i for i, bound in enumerate(SHARD_BUCKETS) if seconds <= bound), len(SHARD_BUCKETS))
+        with self.lock:
+            histogram = self.histograms.setdefault(
+                stage, {'buckets': [0] * (len(SHARD_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+            )
+            histogram['buckets'][index] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    @contextmanager
+    def timed(self, phase, table='', stage=None):
+        """Time the block as phase (and as one shard of stage, when given)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.add_time(phase, table, elapsed)
+            if stage:
+                self.observe(stage, elapsed)
+
+    def timed_writes(self, write_rows):
+        """Wrap a row writer so every call is timed and counted per table"""
+        def write(cursor, table, columns, rows):
+            with self.timed('write', table):
+                write_rows(cursor, table, columns, rows)
+            self.add_rows(table, len(rows))
+        return write
+
+    def timed_ids(self, ids):
+        """Wrap an id allocator so its take() calls are timed per table"""
+        return TimedIds(ids, self)
+
+    def drain(self):
+        """Everything recorded since the last drain, plus this process's RSS"""
+        with self.lock:
+            snapshot = {'phases': self.phases, 'rows': self.rows, 'histograms': self.histograms}
+            self.reset()
+        snapshot['pid'] = os.getpid()
+        snapshot['rss_bytes'] = current_rss_bytes()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a drained snapshot (from any process) to these totals"""
+        for phase, tables in snapshot['phases'].items():
+            for table, (seconds, calls) in tables.items():
+                self.add_time(phase, table, seconds, calls)
+        for table, count in snapshot['rows'].items():
+            self.add_rows(table, count)
+        with self.lock:
+            for stage, histogram in snapshot['histograms'].items():
+                total = self.histograms.setdefault(
+                    stage, {'buckets': [0] * (len(SHARD_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+                )
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], histogram['buckets'])]
+                total['sum'] += histogram['sum']
+                total['count'] += histogram['count']
+
+
+class TimedIds:
+    """Id allocator proxy that records the time spent reserving keys"""
+
+    def __init__(self, ids, metrics):
+        self.ids = ids
+        self.metrics = metrics
+
+    def take(self, table, count, exact=False):
+        with self.metrics.timed('ids', table):
+            return self.ids.take(table, count, exact)
+
+
+def label_set(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+class MetricsExporter:
+    """Run totals in the main process, written to a JSON-lines log and a Prometheus file.
+
+    A line (and a fresh Prometheus file) is written at most every `interval`
+    seconds while the run progresses and once more at the end. Both carry
+    cumulative totals; the Prometheus file is replaced atomically so a scrape
+    never reads half of it.
+    """
+
+    def __init__(self, log_path=None, prom_path=None, interval=10.0, run_id=None):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self.run_id = run_id
+        self.totals = RunMetrics()
+        self.rss = {}
+        self.started = time.monotonic()
+        self.last_emit = self.started
+
+    def add(self, snapshot):
+        """Merge a worker's drained metrics"""
+        self.totals.merge(snapshot)
+        self.rss[snapshot['pid']] = snapshot['rss_bytes']
+
+    def update(self, sales, days_done, days_total, force=False):
+        """Emit when the interval has passed (or when forced)"""
+        now = time.monotonic()
+        if force or now - self.last_emit >= self.interval:
+            self.last_emit = now
+            self.emit(sales, days_done, days_total)
+
+    def record(self, sales, days_done, days_total):
+        """Current totals as one JSON-serializable record"""
+        self.rss[os.getpid()] = current_rss_bytes()
+        elapsed = time.monotonic() - self.started
+        totals = self.totals
+        with totals.lock:
+            return {
+                'time': datetime.now().isoformat(timespec='seconds'),
+                'run_id': self.run_id,
+                'elapsed_sec': round(elapsed, 3),
+                'sales': sales,
+                'days_done': days_done,
+                'days_total': days_total,
+                'sales_per_sec': round(sales / elapsed, 1) if elapsed > 0 else 0.0,
+                'rss_bytes': sum(self.rss.values()),
+                'processes': len(self.rss),
+                'phases': {
+                    phase: {table: {'seconds': round(seconds, 6), 'calls': calls}
+                            for table, (seconds, calls) in tables.items()}
+                    for phase, tables in totals.phases.items()
+                },
+                'rows': dict(totals.rows),
+                'histograms': {
+                    stage: {'bounds': list(SHARD_BUCKETS), 'buckets': list(h['buckets']),
+                            'sum': round(h['sum'], 6), 'count': h['count']}
+                    for stage, h in totals.histograms.items()
+                },
+            }
+
+    def emit(self, sales, days_done, days_total):
+        record = self.record(sales, days_done, days_total)
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        if self.prom_path:
+            tmp_path = self.prom_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(prometheus_text(record))
+            os.replace(tmp_path, self.prom_path)
+
+    def print_summary(self):
+        """Where the time went, summed over every worker and writer thread"""
+        with self.totals.lock:
+            phases = {phase: dict(tables) for phase, tables in self.totals.phases.items()}
+        total = sum(seconds for tables in phases.values() for seconds, _ in tables.values())
+        if not total:
+            return
+        print("Time by phase (summed over workers and writer threads):")
+        for phase, tables in phases.items():
+            seconds = sum(s for s, _ in tables.values())
+            line = f"  → {phase}: {seconds:.1f}s ({seconds / total:.0%})"
+            per_table = sorted(((s, t) for t, (s, _) in tables.items() if t), reverse=True)
+            if per_table:
+                line += " | " + ", ".join(f"{t} {s:.1f}s" for s, t in per_table[:6])
+                if len(per_table) > 6:
+                    line += f" and {len(per_table) - 6} more"
+            print(line)
+
+
+def prometheus_text(record):
+    """A metrics record in the Prometheus text exposition format"""
+    run = {'run_id': record['run_id']} if record['run_id'] is not None else {}
+    lines = [
+        '# HELP mise_generator_phase_seconds_total Seconds spent per phase and table, summed over workers',
+        '# TYPE mise_generator_phase_seconds_total counter',
+    ]
+    for phase, tables in record['phases'].items():
+        for table, entry in tables.items():
+            lines.append(f"mise_generator_phase_seconds_total{label_set(**run, phase=phase, table=table)} "
+                         f"{entry['seconds']}")
+    lines += [
+        '# HELP mise_generator_phase_calls_total Timed calls per phase and table',
+        '# TYPE mise_generator_phase_calls_total counter',
+    ]
+    for phase, tables in record['phases'].items():
+        for table, entry in tables.items():
+            lines.append(f"mise_generator_phase_calls_total{label_set(**run, phase=phase, table=table)} "
+                         f"{entry['calls']}")
+    lines += [
+        '# HELP mise_generator_rows_total Rows written per table',
+        '# TYPE mise_generator_rows_total counter',
+    ]
+    for table, count in record['rows'].items():
+        lines.append(f"mise_generator_rows_total{label_set(**run, table=table)} {count}")
+    lines += [
+        '# HELP mise_generator_shard_seconds Latency of one shard per stage',
+        '# TYPE mise_generator_shard_seconds histogram',
+    ]
+    for stage, h in record['histograms'].items():
+        cumulative = 0
+        for bound, count in zip(h['bounds'] + ['+Inf'], h['buckets']):
+            cumulative += count
+            lines.append(f"mise_generator_shard_seconds_bucket{label_set(**run, stage=stage, le=bound)} {cumulative}")
+        lines.append(f"mise_generator_shard_seconds_sum{label_set(**run, stage=stage)} {h['sum']}")
+        lines.append(f"mise_generator_shard_seconds_count{label_set(**run, stage=stage)} {h['count']}")
+    for name, kind, help_text, key in [
+        ('sales_total', 'counter', 'Sales generated', 'sales'),
+        ('days_done', 'gauge', 'Sales days finished', 'days_done'),
+        ('days_total', 'gauge', 'Sales days in the run', 'days_total'),
+        ('sales_per_second', 'gauge', 'Average sales/s since the start', 'sales_per_sec'),
+        ('rss_bytes', 'gauge', 'Resident memory of the generator and its workers', 'rss_bytes'),
+        ('elapsed_seconds', 'gauge', 'Seconds since sales generation started', 'elapsed_sec'),
+    ]:
+        lines += [f'# HELP mise_generator_{name} {help_text}', f'# TYPE mise_generator_{name} {kind}',
+                  f"mise_generator_{name}{label_set(**run) if run else ''} {record[key]}"]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated daily rollups of the generated sales.
+
+With --rollups every sales worker adds each shard it builds to a
+SalesRollups. Each finished day carries what the worker drained back to the
+main process, which writes the run's rollups once every shard is committed.
+Money is summed in integer cents, so every rollup row equals the aggregate
+of its raw rows exactly; refresh_rollups recomputes the same rows from the
+raw tables (days loaded by an earlier attempt, by the stream or by files).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS rollup_store_channel_daily (
+        day DATE NOT NULL,
+        store_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        sale_status_desc VARCHAR(100) NOT NULL,
+        sales_count INTEGER NOT NULL,
+        total_amount_items DECIMAL(14,2) NOT NULL,
+        total_discount DECIMAL(14,2) NOT NULL,
+        total_increase DECIMAL(14,2) NOT NULL,
+        delivery_fee DECIMAL(14,2) NOT NULL,
+        service_tax_fee DECIMAL(14,2) NOT NULL,
+        total_amount DECIMAL(14,2) NOT NULL,
+        value_paid DECIMAL(14,2) NOT NULL,
+        production_seconds BIGINT NOT NULL,
+        production_count INTEGER NOT NULL,
+        delivery_seconds BIGINT NOT NULL,
+        delivery_count INTEGER NOT NULL,
+        people_quantity BIGINT NOT NULL,
+        people_count INTEGER NOT NULL,
+        PRIMARY KEY (day, store_id, channel_id, sale_status_desc)
+    );
+    CREATE TABLE IF NOT EXISTS rollup_product_daily (
+        day DATE NOT NULL,
+        product_id INTEGER NOT NULL,
+        sale_status_desc VARCHAR(100) NOT NULL,
+        lines_count INTEGER NOT NULL,
+        sales_count INTEGER NOT NULL,
+        quantity BIGINT NOT NULL,
+        total_price DECIMAL(14,2) NOT NULL,
+        PRIMARY KEY (day, product_id, sale_status_desc)
+    );
+    CREATE TABLE IF NOT EXISTS rollup_hourly (
+        day DATE NOT NULL,
+        weekday SMALLINT NOT NULL,
+        hour SMALLINT NOT NULL,
+        sale_status_desc VARCHAR(100) NOT NULL,
+        sales_count INTEGER NOT NULL,
+        total_amount DECIMAL(14,2) NOT NULL,
+        PRIMARY KEY (day, hour, sale_status_desc)
+    );
+"""
+
+ROLLUP_COLUMNS = {
+    'rollup_store_channel_daily': (
+        'day', 'store_id', 'channel_id', 'sale_status_desc', 'sales_count',
+        'total_amount_items', 'total_discount', 'total_increase', 'delivery_fee', 'service_tax_fee',
+        'total_amount', 'value_paid', 'production_seconds', 'production_count',
+        'delivery_seconds', 'delivery_count', 'people_quantity', 'people_count'
+    ),
+    'rollup_product_daily': (
+        'day', 'product_id', 'sale_status_desc', 'lines_count', 'sales_count', 'quantity', 'total_price'
+    ),
+    'rollup_hourly': ('day', 'weekday', 'hour', 'sale_status_desc', 'sales_count', 'total_amount'),
+}
+
+# The same rows computed from the raw tables, for the days in %(days)s
+# (bounded by %(start)s/%(end)s so date indexes and partitions are used).
+# Float prices go through numeric at 2 decimals, as they were written.
+ROLLUP_REFRESH = {
+    'rollup_store_channel_daily': """
+        SELECT created_at::date, store_id, channel_id, sale_status_desc, count(*),
+               sum(total_amount_items), sum(total_discount), sum(total_increase), sum(delivery_fee),
+               sum(service_tax_fee), sum(total_amount), sum(value_paid),
+               coalesce(sum(production_seconds), 0), count(production_seconds),
+               coalesce(sum(delivery_seconds), 0), count(delivery_seconds),
+               coalesce(sum(people_quantity), 0), count(people_quantity)
+        FROM sales
+        WHERE created_at >= %(start)s AND created_at < %(end)s AND created_at::date = ANY(%(days)s)
+        GROUP BY 1, 2, 3, 4
+    """,
+    'rollup_product_daily': """
+        SELECT s.created_at::date, ps.product_id, s.sale_status_desc, count(*), count(DISTINCT s.id),
+               sum(ps.quantity)::bigint, sum(round(ps.total_price::numeric, 2))
+        FROM product_sales ps
+        JOIN sales s ON s.id = ps.sale_id
+        WHERE s.created_at >= %(start)s AND s.created_at < %(end)s AND s.created_at::date = ANY(%(days)s)
+        GROUP BY 1, 2, 3
+    """,
+    'rollup_hourly': """
+        SELECT created_at::date, EXTRACT(DOW FROM created_at)::smallint,
+               EXTRACT(HOUR FROM created_at)::smallint, sale_status_desc, count(*), sum(total_amount)
+        FROM sales
+        WHERE created_at >= %(start)s AND created_at < %(end)s AND created_at::date = ANY(%(days)s)
+        GROUP BY 1, 2, 3, 4
+    """,
+}
+
+
+def as_list(column):
+    """A batch column (NumPy array or list) as a list of Python values"""
+    return column.tolist() if hasattr(column, 'tolist') else column
+
+
+def money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class SalesRollups:
+    """Rollup sums keyed by day, built from columnar sales batches.
+
+    rows is {table: {key: [sums]}}; keys start with the date and money sums
+    are integer cents.
+    """
+
+    def __init__(self):
+        self.rows = {table: {} for table in ROLLUP_COLUMNS}
+
+    def add_batch(self, day, batch):
+        """Add one shard of sales (all on day) to the sums"""
+        date = day.date()
+        sales = batch['sales']
+        store_channel = self.rows['rollup_store_channel_daily']
+        hourly = self.rows['rollup_hourly']
+        statuses = as_list(sales['status'])
+        for (store_id, channel_id, status, created_at, items, discount, increase, delivery_fee,
+             service_tax, total, paid, production, delivery, people) in zip(
+                as_list(sales['store_id']), as_list(sales['channel_id']), statuses,
+                as_list(sales['created_at']), as_list(sales['total_items_value']),
+                as_list(sales['discount']), as_list(sales['increase']), as_list(sales['delivery_fee']),
+                as_list(sales['service_tax']), as_list(sales['total_amount']), as_list(sales['value_paid']),
+                as_list(sales['production_sec']), as_list(sales['delivery_sec']), as_list(sales['people_qty'])):
+            sums = store_channel.setdefault((date, store_id, channel_id, status), [0] * 14)
+            for i, value in enumerate((1, items, discount, increase, delivery_fee, service_tax, total, paid)):
+                sums[i] += value
+            for i, value in ((8, production), (10, delivery), (12, people)):
+                if value is not None:
+                    sums[i] += value
+                    sums[i + 1] += 1
+            sums = hourly.setdefault((date, created_at.hour, status), [0, 0])
+            sums[0] += 1
+            sums[1] += total
+
+        # A sale lives in a single shard, so distinct sales per shard add up across shards
+        products = {}
+        lines = batch['product_sales']
+        for sale, product_id, quantity, total_price in zip(
+                as_list(lines['sale']), as_list(lines['product_id']),
+                as_list(lines['quantity']), as_list(lines['total_price'])):
+            sums = products.setdefault((date, product_id, statuses[sale]), [0, set(), 0, 0])
+            sums[0] += 1
+            sums[1].add(sale)
+            sums[2] += quantity
+            sums[3] += total_price
+        product_daily = self.rows['rollup_product_daily']
+        for key, (count, sale_set, quantity, total_price) in products.items():
+            sums = product_daily.setdefault(key, [0, 0, 0, 0])
+            sums[0] += count
+            sums[1] += len(sale_set)
+            sums[2] += quantity
+            sums[3] += total_price
+
+    def drain(self):
+        """Everything added since the last drain"""
+        rows = self.rows
+        self.rows = {table: {} for table in ROLLUP_COLUMNS}
+        return rows
+
+    def merge(self, snapshot):
+        """Add a drained snapshot (from any process) to these sums"""
+        for table, rows in snapshot.items():
+            totals = self.rows[table]
+            for key, sums in rows.items():
+                if key in totals:
+                    totals[key] = [a + b for a, b in zip(totals[key], sums)]
+                else:
+                    totals[key] = list(sums)
+
+    def days(self):
+        return {key[0] for rows in self.rows.values() for key in rows}
+
+    def table_rows(self, table, days):
+        """Rows of table for the given days, money as exact decimals"""
+        rows = []
+        for key, sums in sorted(self.rows[table].items()):
+            if key[0] not in days:
+                continue
+            if table == 'rollup_store_channel_daily':
+                rows.append(key + (sums[0],) + tuple(money(c) for c in sums[1:8]) + tuple(sums[8:]))
+            elif table == 'rollup_product_daily':
+                rows.append(key + tuple(sums[:3]) + (money(sums[3]),))
+            else:
+                day, hour, status = key
+                rows.append((day, day.isoweekday() % 7, hour, status, sums[0], money(sums[1])))
+        return rows
+
+
+def clear_rollup_days(cursor, days):
+    for table in ROLLUP_COLUMNS:
+        cursor.execute(f"DELETE FROM {table} WHERE day = ANY(%s)", (days,))
+
+
+def write_rollups(conn, rollups, write_rows, skip_days=()):
+    """Replace the rollups of every day in rollups (except skip_days) in one transaction"""
+    cursor = conn.cursor()
+    cursor.execute(ROLLUP_DDL)
+    days = sorted(rollups.days() - set(skip_days))
+    clear_rollup_days(cursor, days)
+    counts = {}
+    for table, columns in ROLLUP_COLUMNS.items():
+        rows = rollups.table_rows(table, set(days))
+        if rows:
+            write_rows(cursor, table, columns, rows)
+        counts[table] = len(rows)
+    conn.commit()
+    return len(days), counts
+
+
+def refresh_rollups(conn, days=None):
+    """Recompute the rollups of days (default: every day with sales) from the raw tables"""
+    cursor = conn.cursor()
+    cursor.execute(ROLLUP_DDL)
+    if days is None:
+        cursor.execute("SELECT DISTINCT created_at::date FROM sales")
+        days = [row[0] for row in cursor.fetchall()]
+    days = sorted(days)
+    if not days:
+        conn.commit()
+        return 0
+    clear_rollup_days(cursor, days)
+    bounds = {'start': days[0], 'end': days[-1] + timedelta(days=1), 'days': days}
+    for table, columns in ROLLUP_COLUMNS.items():
+        cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) {ROLLUP_REFRESH[table]}", bounds)
+    conn.commit()
+    return len(days)